@@ -17,6 +17,23 @@ def create_app(config_name='default'):
     db.init_app(app)
     login_manager.init_app(app)
     
+    # Background writer for gate tracking rows
+    from services.tracking_writer import tracking_writer
+    tracking_writer.init_app(app)
+    
+    # Background reload of the in-memory presence table
+    from services.presence import presence_service
+    presence_service.init_app(app)
+    
+    # Emotion inference: micro-batching settings, the background process pool
+    # and the per-user result cache / sampling window
+    from services.emotion_detection import emotion_service
+    from services.emotion_pool import emotion_pool
+    from services.emotion_cache import emotion_cache
+    emotion_service.init_app(app)
+    emotion_pool.init_app(app)
+    emotion_cache.init_app(app)
+    
     # User loader for Flask-Login
     @login_manager.user_loader
     def load_user(user_id):
@@ -79,13 +96,14 @@ def create_app(config_name='default'):
     return app
 
 
-if __name__ == '__main__':
-    app = create_app('development')
+def warm_up(app):
+    """
+    Load models, face galleries and presence state ahead of the first request
     
-    # Create tables if they don't exist
+    Everything loaded here is plain Python/numpy state that is safe to share
+    with forked workers, so wsgi.py runs it once in the server master.
+    """
     with app.app_context():
-        db.create_all()
-        
         # Initialize chatbot with API key
         import os
         from services.chatbot import chatbot
@@ -105,9 +123,46 @@ if __name__ == '__main__':
         visitor_service.load_visitor_faces()
         print("Visitor service initialized")
         
-        # Initialize emotion detection service
-        from services.emotion_detection import emotion_service
-        emotion_service.initialize()
-        print("Emotion detection service initialized")
+        # Warm the in-memory presence table (latest entry per user)
+        from services.presence import presence_service
+        presence_service.load()
+
+
+def init_worker(app):
+    """
+    Per-process setup for handles that must not be shared across fork()
+    
+    Pooled database connections, MediaPipe graphs and TensorFlow sessions are
+    bound to the process (sockets, native threads) that created them, so each
+    worker drops the inherited ones and builds its own.
+    """
+    import sys
+    with app.app_context():
+        # Drop the pool inherited from the master without closing its sockets
+        db.engine.dispose(close=False)
+        
+        if 'services.attention_monitoring' in sys.modules:
+            from services.attention_monitoring import attention_service
+            attention_service.reinitialize()
+        
+        # Emotion models live in the pool's processes, or in this one when the pool is off
+        from services.emotion_pool import emotion_pool
+        if emotion_pool.enabled:
+            emotion_pool.start()
+        else:
+            from services.emotion_detection import emotion_service
+            emotion_service.initialize()
+            print("Emotion detection service initialized")
+
+
+if __name__ == '__main__':
+    app = create_app('development')
+    
+    # Create tables if they don't exist
+    with app.app_context():
+        db.create_all()
+    
+    warm_up(app)
+    init_worker(app)
     
     app.run(host='0.0.0.0', port=5001, debug=True)
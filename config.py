@@ -26,6 +26,70 @@ class Config:
     # Allowed file extensions
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'docx', 'xlsx', 'pptx'}
     
+    # Face index configuration: 'auto' uses exact brute force below
+    # FACE_INDEX_ANN_THRESHOLD encodings and an IVF index above it
+    FACE_INDEX_BACKEND = os.environ.get('FACE_INDEX_BACKEND') or 'auto'
+    FACE_INDEX_ANN_THRESHOLD = int(os.environ.get('FACE_INDEX_ANN_THRESHOLD', 20000))
+    FACE_INDEX_NLIST = int(os.environ['FACE_INDEX_NLIST']) if os.environ.get('FACE_INDEX_NLIST') else None
+    FACE_INDEX_NPROBE = int(os.environ.get('FACE_INDEX_NPROBE', 8))
+    
+    # Storage format for face encodings: float32, float16 or int8 (quantized)
+    FACE_ENCODING_FORMAT = os.environ.get('FACE_ENCODING_FORMAT') or 'float32'
+    
+    # Directory for memory-mapped galleries shared by all worker processes
+    # (unset: each process keeps a private in-memory index)
+    FACE_GALLERY_SHARED_DIR = os.environ.get('FACE_GALLERY_SHARED_DIR')
+
+    # Face detection: backend 'hog' (dlib), 'haar' (OpenCV cascade) or 'dnn'
+    # (OpenCV res10 SSD from FACE_DNN_MODEL_DIR); detection runs on a copy
+    # downscaled to FACE_DETECTION_WIDTH pixels wide (0 = full resolution)
+    FACE_DETECTOR_BACKEND = os.environ.get('FACE_DETECTOR_BACKEND') or 'hog'
+    FACE_DETECTION_WIDTH = int(os.environ.get('FACE_DETECTION_WIDTH', 480))
+    FACE_DNN_MODEL_DIR = os.environ.get('FACE_DNN_MODEL_DIR') or 'data/face_detector'
+    FACE_DNN_CONFIDENCE = float(os.environ.get('FACE_DNN_CONFIDENCE', 0.6))
+
+    # Kiosk face tracking: boxes overlapping the previous frame by at least
+    # FACE_TRACK_IOU_THRESHOLD keep their cached identity/emotion for
+    # FACE_TRACK_REFRESH_SECONDS; tracks unseen for FACE_TRACK_MAX_GAP_SECONDS are lost.
+    # At most FACE_TRACK_MAX_SESSIONS cameras are tracked (least recently seen dropped)
+    FACE_TRACK_IOU_THRESHOLD = float(os.environ.get('FACE_TRACK_IOU_THRESHOLD', 0.3))
+    FACE_TRACK_REFRESH_SECONDS = float(os.environ.get('FACE_TRACK_REFRESH_SECONDS', 10))
+    FACE_TRACK_MAX_GAP_SECONDS = float(os.environ.get('FACE_TRACK_MAX_GAP_SECONDS', 5))
+    FACE_TRACK_MAX_SESSIONS = int(os.environ.get('FACE_TRACK_MAX_SESSIONS', 256))
+
+    # Gate tracking rows are written behind the request by a background thread
+    # in batches of up to TRACKING_WRITER_BATCH_SIZE rows per transaction
+    TRACKING_WRITE_BEHIND = os.environ.get('TRACKING_WRITE_BEHIND', 'true').lower() == 'true'
+    TRACKING_WRITER_BATCH_SIZE = int(os.environ.get('TRACKING_WRITER_BATCH_SIZE', 100))
+    TRACKING_WRITER_FLUSH_INTERVAL = float(os.environ.get('TRACKING_WRITER_FLUSH_INTERVAL', 0.2))
+
+    # Seconds between presence table reloads (picks up other workers' writes; 0 = never)
+    PRESENCE_REFRESH_SECONDS = int(os.environ.get('PRESENCE_REFRESH_SECONDS', 60))
+
+    # Security tracking history paging (keyset pages) and total-count cache lifetime
+    TRACKING_HISTORY_PAGE_SIZE = int(os.environ.get('TRACKING_HISTORY_PAGE_SIZE', 50))
+    TRACKING_HISTORY_MAX_PAGE_SIZE = int(os.environ.get('TRACKING_HISTORY_MAX_PAGE_SIZE', 500))
+    TRACKING_HISTORY_COUNT_TTL = int(os.environ.get('TRACKING_HISTORY_COUNT_TTL', 60))
+
+    # Emotion inference runs in EMOTION_POOL_WORKERS background processes per
+    # web worker (0 = inline in the request, the default outside gunicorn.conf.py,
+    # which sizes the pool); up to EMOTION_POOL_MAX_QUEUE jobs wait, further
+    # jobs are dropped, and results are kept EMOTION_JOB_TTL seconds
+    EMOTION_POOL_WORKERS = int(os.environ.get('EMOTION_POOL_WORKERS', 0))
+    EMOTION_POOL_MAX_QUEUE = int(os.environ.get('EMOTION_POOL_MAX_QUEUE', 32))
+    EMOTION_JOB_TTL = int(os.environ.get('EMOTION_JOB_TTL', 60))
+
+    # Emotion-only face crops are batched: up to EMOTION_BATCH_SIZE crops per
+    # forward pass, collected for at most EMOTION_BATCH_WAIT_MS (1 = no batching)
+    EMOTION_BATCH_SIZE = int(os.environ.get('EMOTION_BATCH_SIZE', 16))
+    EMOTION_BATCH_WAIT_MS = float(os.environ.get('EMOTION_BATCH_WAIT_MS', 5))
+
+    # A recognized user's emotion is reused for EMOTION_CACHE_SECONDS (0 = never),
+    # and at most one EmotionTracking sample per user is stored every
+    # EMOTION_SAMPLE_MINUTES
+    EMOTION_CACHE_SECONDS = int(os.environ.get('EMOTION_CACHE_SECONDS', 60))
+    EMOTION_SAMPLE_MINUTES = float(os.environ.get('EMOTION_SAMPLE_MINUTES', 10))
+    
     # Session Configuration
     PERMANENT_SESSION_LIFETIME = 3600  # 1 hour
     
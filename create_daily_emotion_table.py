@@ -0,0 +1,25 @@
+"""
+Database migration script to create daily_emotion table
+Creates the per-user daily emotion rollup and fills it from existing emotion history
+"""
+
+from app import create_app
+from models import db
+from models.daily_emotion import DailyEmotion
+from services.daily_emotion import rebuild_daily_emotion
+
+def create_daily_emotion_table():
+    """Create and populate the daily_emotion table"""
+    app = create_app('development')
+    with app.app_context():
+        # Create the table
+        db.create_all()
+        print("✓ Daily emotion table created successfully!")
+        print("  - Table: daily_emotion")
+        print("  - Columns: id, user_id, date, sample_count, confidence_sum, dominant_emotion, <emotion>_count, sad_streak, last_sample_at")
+        
+        count = rebuild_daily_emotion()
+        print(f"✓ Built {count} daily emotion rows from emotion_tracking")
+
+if __name__ == '__main__':
+    create_daily_emotion_table()
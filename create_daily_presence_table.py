@@ -0,0 +1,25 @@
+"""
+Database migration script to create daily_presence table
+Creates the per-user daily presence rollup and fills it from existing tracking history
+"""
+
+from app import create_app
+from models import db
+from models.daily_presence import DailyPresence
+from services.daily_presence import rebuild_daily_presence
+
+def create_daily_presence_table():
+    """Create and populate the daily_presence table"""
+    app = create_app('development')
+    with app.app_context():
+        # Create the table
+        db.create_all()
+        print("✓ Daily presence table created successfully!")
+        print("  - Table: daily_presence")
+        print("  - Columns: id, user_id, date, first_in, last_out, current_state, last_entry_at, location, entry_count")
+        
+        count = rebuild_daily_presence()
+        print(f"✓ Built {count} daily presence rows from student_tracking")
+
+if __name__ == '__main__':
+    create_daily_presence_table()
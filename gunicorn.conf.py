@@ -0,0 +1,52 @@
+"""
+Gunicorn configuration
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Worker sizing: the default is ONE worker with several threads. Some state is
+still per process: the presence table, the emotion cache and sampling window,
+kiosk face tracks and emotion pool jobs (a job can only be polled on the
+worker that queued it). With several workers each keeps its own copy, so
+emotion samples are stored once per worker and job polls can miss. Only raise
+GUNICORN_WORKERS behind sticky sessions and once that state is shared.
+
+Emotion inference, the CPU heavy part, runs in the worker's emotion pool
+(spawned processes holding the TensorFlow/DeepFace models, several hundred MB
+each), by default one process per core split across the workers. On a small
+box where memory is the limit, lower EMOTION_POOL_WORKERS first. Native math
+libraries are limited to one thread per process so the pool does not
+oversubscribe the cores.
+"""
+
+import multiprocessing
+import os
+
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
+bind = os.environ.get('GUNICORN_BIND') or '0.0.0.0:5001'
+# One worker until presence, emotion cache and pool jobs are shared (see above)
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Read by config.py when the app is preloaded below
+os.environ.setdefault('EMOTION_POOL_WORKERS', str(max(1, multiprocessing.cpu_count() // workers)))
+
+# Import wsgi (and warm the galleries) in the master, then fork
+preload_app = True
+
+# First emotion inference in a worker can take a while
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+
+
+def post_fork(server, worker):
+    """Rebuild per-process handles (DB pool, MediaPipe, TensorFlow) in each worker"""
+    from app import init_worker
+    from wsgi import app
+    init_worker(app)
+
+
+def worker_exit(server, worker):
+    """Write any gate tracking rows still queued behind requests"""
+    from services.tracking_writer import tracking_writer
+    tracking_writer.flush()
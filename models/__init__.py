@@ -21,6 +21,12 @@ from models.attention_log import AttentionLog
 # Import VisitorEntry model
 from models.visitor_entry import VisitorEntry
 
+# Import DailyPresence model
+from models.daily_presence import DailyPresence
+
+# Import DailyEmotion model
+from models.daily_emotion import DailyEmotion
+
 
 class User(UserMixin, db.Model):
     """User model with role-based access"""
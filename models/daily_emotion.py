@@ -0,0 +1,69 @@
+from models import db
+from datetime import datetime
+
+
+# Emotions DeepFace reports; each has a per-day sample counter
+EMOTIONS = ('angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral')
+
+
+class DailyEmotion(db.Model):
+    """Per-user daily emotion rollup of emotion_tracking (one row per user per IST day)"""
+    __tablename__ = 'daily_emotion'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'date', name='uq_daily_emotion_user_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False, index=True)  # IST calendar date
+    sample_count = db.Column(db.Integer, default=0, nullable=False)
+    confidence_sum = db.Column(db.Float, default=0.0, nullable=False)
+    dominant_emotion = db.Column(db.String(50))  # most frequent dominant emotion of the day
+
+    # Samples per dominant emotion
+    angry_count = db.Column(db.Integer, default=0, nullable=False)
+    disgust_count = db.Column(db.Integer, default=0, nullable=False)
+    fear_count = db.Column(db.Integer, default=0, nullable=False)
+    happy_count = db.Column(db.Integer, default=0, nullable=False)
+    sad_count = db.Column(db.Integer, default=0, nullable=False)
+    surprise_count = db.Column(db.Integer, default=0, nullable=False)
+    neutral_count = db.Column(db.Integer, default=0, nullable=False)
+
+    # Consecutive IST days with a sad sample ending on this day (0 if none today)
+    sad_streak = db.Column(db.Integer, default=0, nullable=False, index=True)
+    last_sample_at = db.Column(db.DateTime, nullable=True)  # UTC
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationship
+    user = db.relationship('User', backref='daily_emotion')
+
+    @property
+    def mean_confidence(self):
+        """Mean confidence over the day's samples"""
+        return self.confidence_sum / self.sample_count if self.sample_count else 0.0
+
+    def counts(self):
+        """Samples per emotion for the day"""
+        return {emotion: getattr(self, f'{emotion}_count') or 0 for emotion in EMOTIONS}
+
+    def apply(self, emotion, confidence, timestamp, previous=None):
+        """
+        Fold one emotion sample into the rollup
+
+        previous is the user's row for the day before, if any; the first sad
+        sample of the day extends its sad streak by one.
+        """
+        emotion = (emotion or '').lower()
+        if emotion in EMOTIONS:
+            setattr(self, f'{emotion}_count', (getattr(self, f'{emotion}_count') or 0) + 1)
+            counts = self.counts()
+            self.dominant_emotion = max(EMOTIONS, key=lambda name: counts[name])
+        if emotion == 'sad' and not self.sad_streak:
+            self.sad_streak = (previous.sad_streak if previous is not None and previous.sad_streak else 0) + 1
+        self.sample_count = (self.sample_count or 0) + 1
+        self.confidence_sum = (self.confidence_sum or 0.0) + (confidence or 0.0)
+        if self.last_sample_at is None or timestamp > self.last_sample_at:
+            self.last_sample_at = timestamp
+
+    def __repr__(self):
+        return f'<DailyEmotion {self.user_id} on {self.date} - {self.dominant_emotion}>'
@@ -0,0 +1,39 @@
+from models import db
+from datetime import datetime
+
+
+class DailyPresence(db.Model):
+    """Per-user daily presence rollup of student_tracking (one row per user per IST day)"""
+    __tablename__ = 'daily_presence'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'date', name='uq_daily_presence_user_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False, index=True)  # IST calendar date
+    first_in = db.Column(db.DateTime, nullable=True)  # UTC, first IN of the day
+    last_out = db.Column(db.DateTime, nullable=True)  # UTC, last OUT of the day
+    current_state = db.Column(db.String(10), nullable=False)  # entry type of the latest entry: 'IN' or 'OUT'
+    last_entry_at = db.Column(db.DateTime, nullable=False)  # UTC
+    location = db.Column(db.String(100))  # location of the latest entry
+    entry_count = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationship
+    user = db.relationship('User', backref='daily_presence')
+
+    def apply(self, entry_type, timestamp, location=None):
+        """Fold one tracking entry into the rollup"""
+        if entry_type == 'IN' and (self.first_in is None or timestamp < self.first_in):
+            self.first_in = timestamp
+        if entry_type == 'OUT' and (self.last_out is None or timestamp > self.last_out):
+            self.last_out = timestamp
+        if self.last_entry_at is None or timestamp >= self.last_entry_at:
+            self.current_state = entry_type
+            self.last_entry_at = timestamp
+            self.location = location
+        self.entry_count = (self.entry_count or 0) + 1
+
+    def __repr__(self):
+        return f'<DailyPresence {self.user_id} on {self.date} - {self.current_state}>'
@@ -5,11 +5,15 @@ from datetime import datetime
 class StudentTracking(db.Model):
     """Student entry/exit tracking model"""
     __tablename__ = 'student_tracking'
+    __table_args__ = (
+        # Per-user history and "latest entry" lookups
+        db.Index('ix_student_tracking_user_timestamp', 'user_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     entry_type = db.Column(db.String(10), nullable=False)  # 'IN' or 'OUT'
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     verification_method = db.Column(db.String(20), default='face')  # face recognition
     location = db.Column(db.String(100), default='Main Gate')
     
@@ -292,9 +292,9 @@ def add_user():
         db.session.commit()
         
         if face_encoding_data:
-            # Reload face recognition service to include new face
+            # Add the new face to the recognition gallery
             from services.face_recognition import face_recognition_service
-            face_recognition_service.load_known_faces()
+            face_recognition_service.add_known_face(user.id, encoding)
             flash(f'User added successfully with face recognition enabled!', 'success')
         else:
             flash('User added successfully!', 'success')
@@ -410,6 +410,10 @@ def delete_user(user_id):
     db.session.delete(user)
     db.session.commit()
     
+    # Drop the user from the face recognition gallery
+    from services.face_recognition import face_recognition_service
+    face_recognition_service.remove_known_face(user_id)
+    
     flash('User deleted successfully!', 'success')
     return redirect(url_for('admin.users'))
 
@@ -693,10 +697,10 @@ def update_faculty(faculty_id):
                     # Store changes to commit below
                     db.session.flush()
                     
-                    # Reload face recognition service
+                    # Update the face recognition gallery
                     try:
                         from services.face_recognition import face_recognition_service
-                        face_recognition_service.load_known_faces()
+                        face_recognition_service.add_known_face(faculty.id, encoding)
                         flash(f'Profile and face recognition updated for {faculty.full_name}!', 'success')
                     except Exception as e:
                         print(f"Error reloading faces: {e}")
@@ -796,3 +800,37 @@ def anonymous_messages():
                          resolved_count=resolved_count,
                          status_filter=status_filter,
                          category_filter=category_filter)
+
+
+@admin_bp.route('/export/<kind>')
+@login_required
+@admin_required
+def export_logs(kind):
+    """
+    Stream tracking, visitor or emotion logs as a download
+    
+    Query parameters: format=csv|ndjson, gzip=1, start_date / end_date (YYYY-MM-DD, IST days)
+    """
+    from flask import Response, stream_with_context, abort
+    from services.export import EXPORTS, FORMATS, export_stream
+    
+    fmt = request.args.get('format', 'csv')
+    if kind not in EXPORTS or fmt not in FORMATS:
+        abort(404)
+    
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+        end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+    except ValueError:
+        abort(400)
+    
+    compress = request.args.get('gzip') in ('1', 'true')
+    filename = f"{kind}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{fmt}" + ('.gz' if compress else '')
+    
+    return Response(
+        stream_with_context(export_stream(kind, fmt, start, end, compress)),
+        mimetype='application/gzip' if compress else FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
@@ -1,10 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_login import current_user, login_required
 from services.chatbot import chatbot
-from services.face_recognition import face_recognition_service
+from services.identity import identity_resolver, USER, VISITOR
 from models import db, User, StudentTracking
-from datetime import datetime, timedelta
-import pytz
+from utils.timezone import to_ist, ist_today, ist_day_range
 
 chat_api_bp = Blueprint('chat_api', __name__)
 
@@ -82,18 +81,31 @@ def recognize_image():
         # Read image data
         image_data = image_file.read()
         
-        # Use face recognition service to identify the person
-        success, user, message, emotion_result = face_recognition_service.verify_face(
-            image_data,
-            user_id=None,
-            mark_attendance=False  # Don't mark attendance for image uploads
-        )
+        # Identify the person against registered users and visitors in one pass
+        # (no attendance is marked for image uploads)
+        match = identity_resolver.best(image_data)
+        user = User.query.get(match['id']) if match and match['kind'] == USER else None
         
-        if success and user:
+        if match and match['kind'] == VISITOR:
+            from models.visitor_entry import VisitorEntry
+            visitor = VisitorEntry.query.get(match['id'])
+            if visitor:
+                return jsonify({
+                    'success': True,
+                    'recognized': True,
+                    'user': {
+                        'full_name': visitor.name,
+                        'role': 'Visitor',
+                        'organization': visitor.organization or "N/A",
+                        'availability': "Currently on campus" if visitor.status == 'IN' else "Not on campus"
+                    },
+                    'message': f"✅ Recognized visitor: {visitor.name}"
+                })
+        
+        if user:
             # Get user's availability status
-            ist = pytz.timezone('Asia/Kolkata')
-            today_start = datetime.now(ist).replace(hour=0, minute=0, second=0, microsecond=0)
-            today_end = today_start + timedelta(days=1)
+            # Today's IST day as a UTC range (stored timestamps are UTC)
+            today_start, today_end = ist_day_range(ist_today())
             
             # Get today's tracking records
             tracking_records = StudentTracking.query.filter(
@@ -108,7 +120,7 @@ def recognize_image():
             
             if tracking_records:
                 last_record = tracking_records[0]
-                last_entry_time = last_record.timestamp.astimezone(ist).strftime('%I:%M %p')
+                last_entry_time = to_ist(last_record.timestamp).strftime('%I:%M %p')
                 
                 if last_record.entry_type == 'IN':
                     availability_status = f"Currently in university (entered at {last_entry_time})"
@@ -5,13 +5,20 @@ Provides endpoints for analyzing facial emotions
 
 from flask import Blueprint, request, jsonify
 from services.emotion_detection import emotion_service
-import base64
-import os
-from werkzeug.utils import secure_filename
+from services.emotion_pool import emotion_pool
 
 emotion_api_bp = Blueprint('emotion_api', __name__)
 
 
+@emotion_api_bp.before_request
+def start_warm_up():
+    """Start loading the emotion models on first use if init_worker() did not"""
+    if emotion_pool.enabled:
+        emotion_pool.start()
+    else:
+        emotion_service.initialize_in_background()
+
+
 @emotion_api_bp.route('/analyze', methods=['POST'])
 def analyze_emotion():
     """
@@ -19,11 +26,19 @@ def analyze_emotion():
     
     Expects:
         - image: file upload or base64 encoded image
+        - actions (optional): comma-separated subset of emotion,age,gender
+          (default: emotion only)
         
     Returns:
         JSON with emotion analysis results
     """
     try:
+        actions = request.values.get('actions')
+        if actions is None and request.is_json:
+            actions = (request.json or {}).get('actions')
+        if isinstance(actions, str):
+            actions = [action.strip() for action in actions.split(',') if action.strip()]
+        
         # Check if image is provided as file upload
         if 'image' in request.files:
             file = request.files['image']
@@ -34,25 +49,28 @@ def analyze_emotion():
                     'error': 'No file selected'
                 }), 400
             
-            # Save temporarily
-            temp_path = os.path.join('/tmp', secure_filename(file.filename))
-            file.save(temp_path)
+            # Decoded in memory: no temp file round trip
+            image_data = file.read()
             
             # Analyze emotion
-            result = emotion_service.analyze_from_file(temp_path)
-            
-            # Clean up
-            try:
-                os.remove(temp_path)
-            except:
-                pass
+            if emotion_pool.enabled:
+                result = emotion_pool.run(emotion_service.decode_image(image_data), actions=actions)
+            else:
+                result = emotion_service.analyze_from_bytes(image_data, actions)
             
+            if result is None:
+                return _busy()
             return jsonify(result)
         
         # Check if image is provided as base64
         elif request.json and 'image' in request.json:
             base64_image = request.json['image']
-            result = emotion_service.analyze_from_base64(base64_image)
+            if emotion_pool.enabled:
+                result = emotion_pool.run(emotion_service.decode_base64(base64_image), actions=actions)
+            else:
+                result = emotion_service.analyze_from_base64(base64_image, actions)
+            if result is None:
+                return _busy()
             return jsonify(result)
         
         else:
@@ -70,11 +88,52 @@ def analyze_emotion():
         }), 500
 
 
+def _busy():
+    """Response when the emotion pool dropped the job (queue full) or timed out"""
+    return jsonify({
+        'success': False,
+        'error': 'Emotion analysis is busy, please retry',
+        'dominant_emotion': 'neutral',
+        'greeting_message': ''
+    }), 503
+
+
+@emotion_api_bp.route('/jobs/<job_id>', methods=['GET'])
+def emotion_job(job_id):
+    """
+    Result of a background emotion job (job ids come back from face recognition)
+    
+    Query parameters: wait=<seconds> to wait up to 2 seconds for a pending job
+    """
+    job = emotion_pool.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired job'}), 404
+    
+    wait = min(request.args.get('wait', 0, type=float), 2.0)
+    if wait > 0 and not job.done:
+        job.wait(wait)
+    
+    return jsonify({'success': True, **job.to_dict()})
+
+
 @emotion_api_bp.route('/health', methods=['GET'])
 def health_check():
-    """Check if emotion detection service is available"""
+    """
+    Readiness of the emotion detection models
+    
+    Returns 503 until initialize() has loaded and warmed the models, so a load
+    balancer can hold traffic off a worker that is still warming up. The
+    warm-up is started by the first request here if it was not already.
+    """
+    health = emotion_pool.health() if emotion_pool.enabled else emotion_service.health()
+    health.setdefault('error', None)
+    if health['ready']:
+        status = 'ok'
+    else:
+        status = 'error' if health['error'] else 'warming_up'
     return jsonify({
-        'status': 'ok',
+        'status': status,
         'service': 'emotion_detection',
-        'initialized': emotion_service.initialized
-    })
+        'initialized': health['ready'],
+        **health
+    }), 200 if health['ready'] else 503
@@ -61,8 +61,11 @@ def verify():
     
     # Get user_id from form data (for manual confirmation)
     user_id = request.form.get('user_id')
-    
-    # Verify face
+
+    # Batch mode: log every recognized face in the frame
+    if request.form.get('batch') and not user_id:
+        return verify_batch(image_data)
+
     # Verify face
     success, user, message, emotion_data = face_recognition_service.verify_face(
         image_data,
@@ -85,12 +88,13 @@ def verify():
             }
         }
         
-        # Add emotion data if available
+        # Add emotion data if available (or the pool job id while it is pending)
         if emotion_data:
             response_data['emotion'] = {
                 'dominant_emotion': emotion_data.get('dominant_emotion'),
                 'confidence': emotion_data.get('confidence'),
-                'greeting_message': emotion_data.get('greeting_message')
+                'greeting_message': emotion_data.get('greeting_message'),
+                'job_id': emotion_data.get('job_id')
             }
             
         return jsonify(response_data)
@@ -101,6 +105,53 @@ def verify():
         }), 400
 
 
+def verify_batch(image_data):
+    """Verify all faces in a frame; top-level fields mirror the first recognized face"""
+    success, results, message = face_recognition_service.verify_faces(image_data, mark_attendance=True)
+
+    faces = []
+    for result in results:
+        user = result['user']
+        emotion = result['emotion']
+        faces.append({
+            'box': list(result['box']),
+            'recognized': result['recognized'],
+            'success': result['success'],
+            'entry_type': result['entry_type'],
+            'message': result['message'],
+            'confidence': round(result['confidence'], 1),
+            'user': {
+                'id': user.id,
+                'username': user.username,
+                'full_name': user.full_name,
+                'first_name': getattr(user, 'first_name', ''),
+                'last_name': getattr(user, 'last_name', ''),
+                'registration_id': getattr(user, 'registration_id', ''),
+                'role': user.role
+            } if user else None,
+            'emotion': {
+                'dominant_emotion': emotion.get('dominant_emotion'),
+                'confidence': emotion.get('confidence'),
+                'greeting_message': emotion.get('greeting_message'),
+                'job_id': emotion.get('job_id')
+            } if emotion else None
+        })
+
+    if not success:
+        return jsonify({
+            'success': False,
+            'error': message,
+            'faces': faces
+        }), 400
+
+    first = next(face for face in faces if face['recognized'])
+    return jsonify({
+        'success': True,
+        'message': ' | '.join(face['message'] for face in faces if face['recognized']),
+        'user': first['user'],
+        'emotion': first['emotion'],
+        'faces': faces
+    })
 
 
 @face_api_bp.route('/recognize-visitor', methods=['POST'])
@@ -112,14 +163,16 @@ def recognize_visitor():
     image_file = request.files['image']
     image_data = image_file.read()
     
+    # Kiosks identify their camera so faces can be tracked between ticks
+    camera_id = request.form.get('camera_id') or request.remote_addr
+    
     # First, check if there's actually a face in the image
-    import numpy as np
-    import cv2
-    import face_recognition as fr
+    from services.face_frame import AnalyzedFrame
+    from services.face_tracking import get_face_tracker
     
     try:
-        nparr = np.frombuffer(image_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        frame = AnalyzedFrame(image_data)
+        img = frame.image
         
         if img is None:
             return jsonify({
@@ -129,10 +182,12 @@ def recognize_visitor():
                 'message': 'Invalid image data'
             })
         
-        rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        
         # Detect faces first
-        face_locations = fr.face_locations(rgb_img)
+        face_locations = frame.face_locations
+        
+        # Match boxes to the faces seen on this camera's previous frames
+        tracker = get_face_tracker()
+        tracks = tracker.observe(camera_id, face_locations)
         
         # If no faces detected, return immediately
         if len(face_locations) == 0:
@@ -143,9 +198,14 @@ def recognize_visitor():
                 'message': 'No face detected in frame'
             })
         
-        # Face detected, now try to recognize
+        # Same person still in front of the camera: reuse the cached identity and emotion
+        track = tracks[0]
+        if track.is_fresh(tracker.refresh_interval):
+            return jsonify(track.result)
+        
+        # New track (or refresh due), now try to recognize (reuses the frame's detection)
         success, user, message, _ = face_recognition_service.verify_face(
-            image_data,
+            frame,
             user_id=None,
             mark_attendance=False  # Don't mark attendance for visitor page
         )
@@ -154,23 +214,53 @@ def recognize_visitor():
         emotion_data = None
         try:
             from services.emotion_detection import emotion_service
+            from services.emotion_pool import emotion_pool
+            from services.emotion_cache import emotion_cache
+            
+            user_id = user.id if success and user else None
             
-            # Analyze emotion
-            emotion_result = emotion_service.analyze_emotion(img)
-            if emotion_result.get('success'):
-                emotion_data = {
+            def kiosk_emotion(emotion_result):
+                return {
                     'emotion': emotion_result.get('dominant_emotion', 'neutral'),
                     'confidence': emotion_result.get('confidence', 0.5),
                     'greeting_message': emotion_result.get('greeting_message', ''),
                     'age': emotion_result.get('age'),
                     'gender': emotion_result.get('gender')
                 }
+            
+            cached = emotion_cache.get(user_id) if user_id else None
+            if cached:
+                # Recognized user analyzed moments ago (gate, kiosk or chat)
+                emotion_data = kiosk_emotion(cached)
+            elif emotion_pool.enabled:
+                # Analyzed in the background; the kiosk fetches the job, and the
+                # track's cached result is filled in once it is done
+                pending = {'job_id': None, 'pending': True}
+                
+                def fill_in(emotion_result):
+                    if emotion_result.get('success'):
+                        pending.update(kiosk_emotion(emotion_result))
+                        if user_id:
+                            emotion_cache.put(user_id, emotion_result)
+                    pending['pending'] = False
+                
+                job = emotion_pool.submit(img, track.box, key=('track', camera_id, track.id), callback=fill_in)
+                if job is not None:
+                    pending['job_id'] = job.id
+                    emotion_data = pending
+            else:
+                # Analyze emotion on the tracked face's crop (no second detection)
+                emotion_result = emotion_service.analyze_face(img, track.box)
+                if emotion_result.get('success'):
+                    emotion_data = kiosk_emotion(emotion_result)
+                    if user_id:
+                        emotion_cache.put(user_id, emotion_result)
         except Exception as e:
             print(f"Error analyzing emotion: {str(e)}")
             # Continue without emotion data
         
         if success and user:
-            return jsonify({
+            result = {
                 'success': True,
                 'recognized': True,
                 'face_detected': True,
@@ -182,16 +272,19 @@ def recognize_visitor():
                     'role': user.role
                 },
                 'emotion': emotion_data
-            })
+            }
         else:
             # Face detected but not recognized - guest visitor
-            return jsonify({
+            result = {
                 'success': True,
                 'recognized': False,
                 'face_detected': True,
                 'message': 'Face detected but not recognized - guest visitor',
                 'emotion': emotion_data
-            })
+            }
+        
+        track.update(result)
+        return jsonify(result)
     
     except Exception as e:
         print(f"Error in recognize-visitor: {str(e)}")
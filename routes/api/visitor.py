@@ -94,21 +94,31 @@ def recognize():
         except Exception as e:
             return jsonify({'success': False, 'message': f'Invalid photo format: {str(e)}'}), 400
         
-        # Check for returning visitor
-        is_returning, visitor, confidence, message = visitor_service.check_returning_visitor(photo_data)
+        # Resolve against registered users and previous visitors in one pass
+        from services.identity import identity_resolver, VISITOR
+        from models.visitor_entry import VisitorEntry
+        
+        visitor_service._ensure_faces_loaded()
+        match = identity_resolver.best(photo_data)
+        
+        visitor = None
+        if match and match['kind'] == VISITOR:
+            visitor = VisitorEntry.query.get(match['id'])
         
-        if is_returning and visitor:
+        if visitor:
             return jsonify({
                 'success': True,
                 'is_returning': True,
+                'is_member': False,
                 'visitor': visitor.to_dict(),
-                'confidence': confidence,
+                'confidence': match['confidence'],
                 'message': f'Welcome back, {visitor.name}!'
             })
         else:
             return jsonify({
                 'success': True,
                 'is_returning': False,
+                'is_member': bool(match and match['kind'] != VISITOR),
                 'message': 'New visitor'
             })
     
@@ -1,9 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
-from models import db, User, EmotionTracking
-from models.student_tracking import StudentTracking
-from datetime import datetime, timedelta
-import pytz
+from models import db, User
+from services.daily_emotion import sad_streak_students, recent_days
 from functools import wraps
 
 counselor_bp = Blueprint('counselor', __name__)
@@ -67,61 +65,27 @@ def dashboard():
 def get_sad_students():
     """Get students detected as sad for 2+ consecutive days"""
     try:
-        # Get all students
-        students = User.query.filter_by(role='Student').all()
+        # One windowed query over the daily emotion rollup instead of a query per student
+        flagged = sad_streak_students(days=7, min_streak=2)
+        recent = recent_days([student.id for student, _ in flagged], days=7, limit=5)
         sad_students = []
         
-        ist = pytz.timezone('Asia/Kolkata')
-        today = datetime.now(ist).date()
-        
-        for student in students:
-            # Get emotion tracking records for the last 7 days
-            records = EmotionTracking.query.filter(
-                EmotionTracking.user_id == student.id,
-                EmotionTracking.timestamp >= datetime.utcnow() - timedelta(days=7)
-            ).order_by(EmotionTracking.timestamp.desc()).all()
-            
-            # Analyze for consecutive sad days
-            sad_days = set()
-            recent_emotions = []
-            
-            for record in records:
-                # Convert to IST date
-                record_date = record.timestamp.replace(tzinfo=pytz.UTC).astimezone(ist).date()
-                emotion = record.dominant_emotion.lower()
-                
-                recent_emotions.append({
-                    'date': record_date.strftime('%Y-%m-%d'),
-                    'emotion': emotion,
-                    'confidence': record.confidence
-                })
-                
-                if emotion == 'sad':
-                    sad_days.add(record_date)
-            
-            # Check for consecutive days
-            is_alert = False
-            sorted_sad_days = sorted(list(sad_days), reverse=True)
-            
-            if len(sorted_sad_days) >= 2:
-                for i in range(len(sorted_sad_days) - 1):
-                    # Check if days are consecutive (diff is 1 day)
-                    if (sorted_sad_days[i] - sorted_sad_days[i+1]).days == 1:
-                        is_alert = True
-                        break
-            
-            if is_alert:
-                sad_students.append({
-                    'id': student.id,
-                    'name': student.full_name,
-                    'registration_id': student.registration_id,
-                    'department': student.department.name if student.department else 'N/A',
-                    'program': student.program.name if student.program else 'N/A',
-                    'year': student.year,
-                    'profile_picture': student.profile_picture,
-                    'sad_days_count': len(sad_days),
-                    'recent_emotions': recent_emotions[:5]  # Last 5 emotion records
-                })
+        for student, sad_days_count in flagged:
+            sad_students.append({
+                'id': student.id,
+                'name': student.full_name,
+                'registration_id': student.registration_id,
+                'department': student.department.name if student.department else 'N/A',
+                'program': student.program.name if student.program else 'N/A',
+                'year': student.year,
+                'profile_picture': student.profile_picture,
+                'sad_days_count': int(sad_days_count or 0),
+                'recent_emotions': [{
+                    'date': day.date.strftime('%Y-%m-%d'),
+                    'emotion': (day.dominant_emotion or 'neutral').lower(),
+                    'confidence': day.mean_confidence
+                } for day in recent[student.id]]  # Last 5 days, one summary per day
+            })
         
         return jsonify({
             'success': True,
@@ -1,10 +1,14 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from models import db, User
 from models.student_tracking import StudentTracking
+from models.daily_presence import DailyPresence
+from services.daily_presence import today_summary
+from utils.timezone import ist_today, ist_day_range, filter_ist_days, to_ist
 from datetime import datetime, timedelta
-import pytz
 from functools import wraps
+from sqlalchemy.orm import contains_eager
+import time
 
 security_bp = Blueprint('security', __name__)
 
@@ -114,14 +118,11 @@ def admin_dashboard():
 def student_tracking():
     """Get today's student tracking records"""
     try:
-        # Use Indian Standard Time
-        ist = pytz.timezone('Asia/Kolkata')
-        now_ist = datetime.now(ist)
-        today = now_ist.date()
-        
-        # Get all tracking records for today
+        # Today's IST day as a UTC range (index range scan on timestamp)
+        day_start, day_end = ist_day_range(ist_today())
         tracking_records = StudentTracking.query.filter(
-            db.func.date(StudentTracking.timestamp) == today
+            StudentTracking.timestamp >= day_start,
+            StudentTracking.timestamp < day_end
         ).order_by(StudentTracking.timestamp.desc()).all()
         
         # Format the data
@@ -129,8 +130,7 @@ def student_tracking():
         for record in tracking_records:
             user = record.user
             # Convert UTC timestamp to IST
-            utc_time = record.timestamp.replace(tzinfo=pytz.UTC)
-            ist_time = utc_time.astimezone(ist)
+            ist_time = to_ist(record.timestamp)
             
             tracking_list.append({
                 'id': record.id,
@@ -146,7 +146,60 @@ def student_tracking():
         return jsonify({
             'success': True,
             'count': len(tracking_list),
-            'tracking': tracking_list
+            'tracking': tracking_list,
+            'summary': today_summary()
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@security_bp.route('/api/daily-presence')
+@login_required
+@security_required
+def daily_presence():
+    """Get today's per-person presence rollup (first in, last out, current state)"""
+    try:
+        role = request.args.get('role')
+        state = request.args.get('state')  # 'IN' for people currently inside
+        
+        query = db.session.query(User, DailyPresence).join(
+            DailyPresence, User.id == DailyPresence.user_id
+        ).filter(DailyPresence.date == ist_today())
+        
+        if role:
+            query = query.filter(User.role == role)
+        if state:
+            query = query.filter(DailyPresence.current_state == state)
+        
+        def ist_time(timestamp):
+            if timestamp is None:
+                return None
+            return to_ist(timestamp).strftime('%I:%M %p')
+        
+        presence_list = []
+        for user, presence in query.order_by(DailyPresence.last_entry_at.desc()).all():
+            presence_list.append({
+                'user_id': user.id,
+                'name': user.full_name or f"{user.first_name} {user.last_name}",
+                'registration_id': user.registration_id or 'N/A',
+                'role': user.role,
+                'current_state': presence.current_state,
+                'first_in': ist_time(presence.first_in),
+                'last_out': ist_time(presence.last_out),
+                'last_entry': ist_time(presence.last_entry_at),
+                'location': presence.location,
+                'entry_count': presence.entry_count
+            })
+        
+        return jsonify({
+            'success': True,
+            'count': len(presence_list),
+            'presence': presence_list,
+            'summary': today_summary()
         })
     
     except Exception as e:
@@ -156,51 +209,88 @@ def student_tracking():
         }), 500
 
 
+def _tracking_history_query():
+    """Tracking rows joined to their users, filtered by the request's search and IST date range"""
+    search = request.args.get('search', '').strip()
+    start_date = request.args.get('start_date', '')
+    end_date = request.args.get('end_date', '')
+    
+    # Users are loaded by the same join (no per-row lazy load)
+    query = StudentTracking.query.join(User).options(contains_eager(StudentTracking.user))
+    
+    # Apply search filter
+    if search:
+        query = query.filter(
+            db.or_(
+                User.full_name.ilike(f'%{search}%'),
+                User.first_name.ilike(f'%{search}%'),
+                User.last_name.ilike(f'%{search}%'),
+                User.registration_id.ilike(f'%{search}%')
+            )
+        )
+    
+    # Apply date filters (IST days, as UTC timestamp ranges)
+    start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+    end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+    return filter_ist_days(query, StudentTracking.timestamp, start, end)
+
+
+def _encode_cursor(record):
+    return f"{record.timestamp.isoformat()}_{record.id}"
+
+
+def _decode_cursor(cursor):
+    """(timestamp, id) from a next_cursor value; ValueError if it is malformed"""
+    timestamp, record_id = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(timestamp), int(record_id)
+
+
+# Cached history totals: {filter args: (expires_at, count)}
+_history_count_cache = {}
+
+
 @security_bp.route('/api/tracking-history-data')
 @login_required
 @security_required
 def tracking_history_data():
-    """Get all student tracking history with optional filters"""
+    """
+    Get one page of student tracking history with optional filters
+    
+    Pages are keyset-paginated on (timestamp, id), newest first: pass the
+    returned next_cursor as ?cursor= to get the following page.
+    """
     try:
-        # Get query parameters
-        search = request.args.get('search', '').strip()
-        start_date = request.args.get('start_date', '')
-        end_date = request.args.get('end_date', '')
+        page_size = current_app.config.get('TRACKING_HISTORY_PAGE_SIZE', 50)
+        limit = max(1, min(request.args.get('limit', page_size, type=int), current_app.config.get('TRACKING_HISTORY_MAX_PAGE_SIZE', 500)))
+        cursor = request.args.get('cursor')
         
-        # Base query
-        query = StudentTracking.query.join(User)
+        query = _tracking_history_query()
         
-        # Apply search filter
-        if search:
+        if cursor:
+            try:
+                cursor_timestamp, cursor_id = _decode_cursor(cursor)
+            except ValueError:
+                return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
             query = query.filter(
                 db.or_(
-                    User.full_name.ilike(f'%{search}%'),
-                    User.first_name.ilike(f'%{search}%'),
-                    User.last_name.ilike(f'%{search}%'),
-                    User.registration_id.ilike(f'%{search}%')
+                    StudentTracking.timestamp < cursor_timestamp,
+                    db.and_(StudentTracking.timestamp == cursor_timestamp, StudentTracking.id < cursor_id)
                 )
             )
         
-        # Apply date filters
-        ist = pytz.timezone('Asia/Kolkata')
-        if start_date:
-            start = datetime.strptime(start_date, '%Y-%m-%d').date()
-            query = query.filter(db.func.date(StudentTracking.timestamp) >= start)
-        
-        if end_date:
-            end = datetime.strptime(end_date, '%Y-%m-%d').date()
-            query = query.filter(db.func.date(StudentTracking.timestamp) <= end)
-        
-        # Get records ordered by timestamp descending
-        tracking_records = query.order_by(StudentTracking.timestamp.desc()).all()
+        # One extra row tells whether another page exists
+        tracking_records = query.order_by(
+            StudentTracking.timestamp.desc(), StudentTracking.id.desc()
+        ).limit(limit + 1).all()
+        has_more = len(tracking_records) > limit
+        tracking_records = tracking_records[:limit]
         
         # Format the data
         tracking_list = []
         for record in tracking_records:
             user = record.user
             # Convert UTC timestamp to IST
-            utc_time = record.timestamp.replace(tzinfo=pytz.UTC)
-            ist_time = utc_time.astimezone(ist)
+            ist_time = to_ist(record.timestamp)
             
             tracking_list.append({
                 'id': record.id,
@@ -217,8 +307,47 @@ def tracking_history_data():
         return jsonify({
             'success': True,
             'count': len(tracking_list),
-            'tracking': tracking_list
+            'tracking': tracking_list,
+            'has_more': has_more,
+            'next_cursor': _encode_cursor(tracking_records[-1]) if has_more else None
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@security_bp.route('/api/tracking-history-count')
+@login_required
+@security_required
+def tracking_history_count():
+    """Total number of tracking rows matching the history filters (cached briefly)"""
+    try:
+        ttl = current_app.config.get('TRACKING_HISTORY_COUNT_TTL', 60)
+        key = (
+            request.args.get('search', '').strip().lower(),
+            request.args.get('start_date', ''),
+            request.args.get('end_date', '')
+        )
+        
+        now = time.monotonic()
+        cached = _history_count_cache.get(key)
+        if cached and cached[0] > now:
+            total = cached[1]
+        else:
+            total = _tracking_history_query().order_by(None).count()
+            if len(_history_count_cache) > 256:
+                _history_count_cache.clear()
+            _history_count_cache[key] = (now + ttl, total)
+        
+        response = jsonify({
+            'success': True,
+            'total': total
         })
+        response.headers['Cache-Control'] = f'private, max-age={ttl}'
+        return response
     
     except Exception as e:
         return jsonify({
@@ -0,0 +1,39 @@
+"""
+Database migration script to add timestamp indexes to student_tracking
+Existing databases need this once; db.create_all() does not add indexes to existing tables
+"""
+
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db
+from models.student_tracking import StudentTracking
+
+app = create_app('development')
+
+
+def migrate_database():
+    """Create the (user_id, timestamp) and timestamp indexes if missing"""
+    with app.app_context():
+        print("Adding indexes to student_tracking...")
+        print("-" * 60)
+        
+        try:
+            for index in StudentTracking.__table__.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+                print(f"✓ {index.name} ({', '.join(column.name for column in index.columns)})")
+            
+            print("\n✓ Database migration completed successfully!")
+            return True
+        
+        except Exception as e:
+            print(f"\n✗ Migration error: {str(e)}")
+            return False
+
+
+if __name__ == '__main__':
+    migrate_database()
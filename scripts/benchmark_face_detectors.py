@@ -0,0 +1,100 @@
+"""
+Report latency and recall of each face detector backend
+Reference boxes come from full-resolution HOG; a face counts as found when a
+backend box overlaps it with IoU >= 0.5
+
+Usage:
+    python scripts/benchmark_face_detectors.py [image_dir ...]
+"""
+
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from services.face_detection import BACKENDS, FaceDetector, box_iou
+import cv2
+
+app = create_app('development')
+
+DEFAULT_DIRS = ['static/images/students', 'static/images/faculty']
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+IOU_THRESHOLD = 0.5
+MAX_IMAGES = 200
+
+
+def load_images(dirs):
+    """Decode up to MAX_IMAGES images from the given directories"""
+    images = []
+    for directory in dirs:
+        if not os.path.isdir(directory):
+            continue
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                if not name.lower().endswith(IMAGE_EXTENSIONS) or name.startswith('._'):
+                    continue
+                image = cv2.imread(os.path.join(root, name))
+                if image is not None:
+                    images.append(image)
+                if len(images) >= MAX_IMAGES:
+                    return images
+    return images
+
+
+def run_detector(detector, images):
+    """Detect on every image, returning boxes per image and mean latency in ms"""
+    results = []
+    start = time.perf_counter()
+    for image in images:
+        results.append(detector.detect(image))
+    elapsed = (time.perf_counter() - start) * 1000 / len(images)
+    return results, elapsed
+
+
+def recall(reference, detected):
+    """Fraction of reference boxes matched by a detected box"""
+    total = 0
+    found = 0
+    for ref_boxes, boxes in zip(reference, detected):
+        for ref in ref_boxes:
+            total += 1
+            if any(box_iou(ref, box) >= IOU_THRESHOLD for box in boxes):
+                found += 1
+    return found / total if total else 0.0
+
+
+def benchmark_face_detectors(dirs):
+    """Compare every backend at the configured working width against full-res HOG"""
+    with app.app_context():
+        images = load_images(dirs)
+        if not images:
+            print(f"No images found in: {', '.join(dirs)}")
+            return
+
+        width = app.config.get('FACE_DETECTION_WIDTH', 480)
+        print(f"Face detector report: {len(images)} images, working width {width or 'full'}")
+        print("-" * 60)
+
+        reference, ref_ms = run_detector(FaceDetector(backend='hog', working_width=0), images)
+        print(f"hog (full resolution reference): {ref_ms:.1f} ms/image, "
+              f"{sum(len(boxes) for boxes in reference)} faces")
+
+        for backend in BACKENDS:
+            detector = FaceDetector.from_config(app.config)
+            detector.backend = backend
+            try:
+                detected, ms = run_detector(detector, images)
+            except Exception as e:
+                print(f"✗ {backend}: {e}")
+                continue
+            print(f"{backend:>4} @ {width or 'full'}: {ms:.1f} ms/image, "
+                  f"recall {recall(reference, detected):.3f}, "
+                  f"{sum(len(boxes) for boxes in detected)} boxes")
+
+        print("-" * 60)
+
+
+if __name__ == "__main__":
+    benchmark_face_detectors(sys.argv[1:] or DEFAULT_DIRS)
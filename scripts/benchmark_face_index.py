@@ -0,0 +1,69 @@
+"""
+Report IVF face index recall against exact brute force
+Uses the enrolled user and visitor galleries, probing with jittered copies of real encodings
+"""
+
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from services.face_index import FaceIndex, measure_recall
+import numpy as np
+
+app = create_app('development')
+
+# Thresholds used by the services; agreement is reported against each
+USER_THRESHOLD = 0.5
+VISITOR_THRESHOLD = 0.55
+QUERY_COUNT = 500
+QUERY_NOISE = 0.03
+
+
+def report(name, encodings, threshold, nprobe):
+    """Print recall of an IVF index trained on encodings"""
+    if not encodings:
+        print(f"\n{name}: no encodings, skipping")
+        return
+
+    index = FaceIndex(backend='ivf', nprobe=nprobe, nlist=app.config.get('FACE_INDEX_NLIST'))
+    index.load(encodings.items())
+
+    rng = np.random.default_rng(0)
+    keys = list(encodings.keys())
+    picks = rng.choice(len(keys), size=min(QUERY_COUNT, len(keys)), replace=False)
+    queries = [
+        np.asarray(encodings[keys[i]], dtype=np.float32) + rng.normal(0, QUERY_NOISE, 128).astype(np.float32)
+        for i in picks
+    ]
+
+    result = measure_recall(index, queries, k=1, threshold=threshold)
+    print(f"\n{name}: {len(encodings)} encodings, nprobe={nprobe}")
+    print(f"  recall@1:            {result['recall_at_k']:.4f}")
+    print(f"  threshold agreement: {result['threshold_agreement']:.4f} (threshold {threshold})")
+    print(f"  exact latency:       {result['exact_ms']:.3f} ms/query")
+    print(f"  IVF latency:         {result['ann_ms']:.3f} ms/query")
+
+
+def benchmark_face_index():
+    """Report recall for both galleries"""
+    with app.app_context():
+        from services.face_recognition import face_recognition_service
+        from services.visitor_service import visitor_service
+
+        print("Face index recall report")
+        print("-" * 60)
+
+        face_recognition_service.load_known_faces()
+        visitor_service.load_visitor_faces()
+
+        nprobe = app.config.get('FACE_INDEX_NPROBE', 8)
+        report("Users", face_recognition_service.known_faces, USER_THRESHOLD, nprobe)
+        report("Visitors", visitor_service.known_visitor_faces, VISITOR_THRESHOLD, nprobe)
+
+        print("\n" + "-" * 60)
+
+
+if __name__ == "__main__":
+    benchmark_face_index()
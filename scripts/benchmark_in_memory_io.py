@@ -0,0 +1,149 @@
+"""
+Compare temp-file and in-memory handling of uploads and audio
+Times the I/O part of each endpoint the old way (write a temp file, read it
+back, delete it) against the in-memory path now used:
+
+  emotion upload   /tmp save + cv2.imread          vs  decode from bytes
+  speech to text   temp WAV + sr.AudioFile(path)   vs  sr.AudioFile(BytesIO)
+  text to speech   tts.save(temp MP3) + re-read    vs  write_to_fp(BytesIO)
+
+Speech synthesis and recognition themselves need the network and are not timed;
+the TTS payload is a synthetic MP3-sized stream written in gTTS-sized chunks.
+
+Usage:
+    python scripts/benchmark_in_memory_io.py [iterations]
+"""
+
+import sys
+import os
+import tempfile
+import time
+import wave
+from io import BytesIO
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+from services.emotion_detection import emotion_service
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+TTS_BYTES = 48 * 1024
+TTS_CHUNK = 1024
+
+
+def timed(func):
+    """Mean latency of func in ms over ITERATIONS runs"""
+    func()
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        func()
+    return (time.perf_counter() - start) * 1000 / ITERATIONS
+
+
+def sample_jpeg():
+    """A 640x480 webcam-sized JPEG"""
+    image = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+
+def sample_wav(seconds=3, rate=16000):
+    """A mono 16-bit WAV like the browser recorder uploads"""
+    buffer = BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.random.randint(-2000, 2000, seconds * rate, dtype=np.int16).tobytes())
+    return buffer.getvalue()
+
+
+def write_tts_stream(fp, payload):
+    """Write the way gTTS.write_to_fp does: chunk by chunk as audio arrives"""
+    for offset in range(0, len(payload), TTS_CHUNK):
+        fp.write(payload[offset:offset + TTS_CHUNK])
+
+
+def bench_emotion_upload():
+    data = sample_jpeg()
+
+    def before():
+        path = os.path.join('/tmp', 'upload.jpg')
+        with open(path, 'wb') as f:
+            f.write(data)
+        image = cv2.imread(path)
+        os.remove(path)
+        return image
+
+    def after():
+        return emotion_service.decode_image(data)
+
+    return timed(before), timed(after)
+
+
+def bench_speech_to_text():
+    import speech_recognition as sr
+    recognizer = sr.Recognizer()
+    data = sample_wav()
+
+    def before():
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_audio:
+            temp_audio.write(data)
+            path = temp_audio.name
+        with sr.AudioFile(path) as source:
+            audio = recognizer.record(source)
+        os.unlink(path)
+        return audio
+
+    def after():
+        with sr.AudioFile(BytesIO(data)) as source:
+            return recognizer.record(source)
+
+    return timed(before), timed(after)
+
+
+def bench_text_to_speech():
+    payload = np.random.randint(0, 255, TTS_BYTES, dtype=np.uint8).tobytes()
+
+    def before():
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_audio:
+            path = temp_audio.name
+        with open(path, 'wb') as f:
+            write_tts_stream(f, payload)
+        with open(path, 'rb') as f:
+            audio = f.read()
+        os.unlink(path)
+        return audio
+
+    def after():
+        buffer = BytesIO()
+        write_tts_stream(buffer, payload)
+        return buffer.getvalue()
+
+    return timed(before), timed(after)
+
+
+def main():
+    print("=" * 60)
+    print(f"Temp file vs in-memory I/O ({ITERATIONS} iterations)")
+    print("=" * 60)
+    print(f"{'path':<20}{'temp file ms':>14}{'in-memory ms':>14}{'speedup':>10}")
+    print("-" * 60)
+
+    for name, bench in (
+        ('emotion upload', bench_emotion_upload),
+        ('speech to text', bench_speech_to_text),
+        ('text to speech', bench_text_to_speech),
+    ):
+        try:
+            before, after = bench()
+        except ImportError as e:
+            print(f"{name:<20}skipped ({e})")
+            continue
+        print(f"{name:<20}{before:>14.3f}{after:>14.3f}{before / after:>9.1f}x")
+
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Migrate stored face encodings to the compact binary format
+Converts pickled ndarrays and raw float64 bytes in face_data and visitor_entries
+in bulk (replaces the old fix_face_encodings.py tobytes -> pickle conversion)
+
+Usage:
+    python scripts/migrate_face_encodings.py [float32|float16|int8]
+"""
+
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, FaceData
+from models.visitor_entry import VisitorEntry
+from utils.face_encoding import FORMATS, encode_encoding, decode_encoding, encoded_format
+
+app = create_app('development')
+
+BATCH_SIZE = 500
+
+
+def migrate_table(model, key_column, fmt):
+    """Convert every encoding in one table, committing in batches"""
+    rows = db.session.query(model.id, key_column, model.face_encoding).filter(
+        model.face_encoding.isnot(None),
+        model.face_encoding != b'opencv_placeholder'
+    ).all()
+    print(f"\n{model.__tablename__}: {len(rows)} encodings")
+
+    updates = []
+    skipped = 0
+    failed = 0
+    for row_id, key, blob in rows:
+        if encoded_format(blob) == fmt:
+            skipped += 1
+            continue
+        try:
+            encoding = decode_encoding(blob, allow_legacy=True)
+            updates.append({'id': row_id, 'face_encoding': encode_encoding(encoding, fmt)})
+        except Exception as e:
+            print(f"  ✗ {key}: {e}")
+            failed += 1
+
+    for start in range(0, len(updates), BATCH_SIZE):
+        db.session.bulk_update_mappings(model, updates[start:start + BATCH_SIZE])
+        db.session.commit()
+
+    print(f"  ✓ Converted {len(updates)}, already {fmt}: {skipped}, failed: {failed}")
+
+
+def migrate_face_encodings(fmt='float32'):
+    """Convert user and visitor encodings to the given format"""
+    if fmt not in FORMATS:
+        print(f"Unknown format '{fmt}'. Use one of: {', '.join(FORMATS)}")
+        sys.exit(1)
+
+    with app.app_context():
+        print(f"Migrating face encodings to {fmt}...")
+        print("-" * 60)
+
+        migrate_table(FaceData, FaceData.user_id, fmt)
+        migrate_table(VisitorEntry, VisitorEntry.id, fmt)
+
+        # Test loading
+        print("\n" + "-" * 60)
+        print("Reloading galleries...")
+        from services.face_recognition import face_recognition_service
+        from services.visitor_service import visitor_service
+        face_recognition_service.load_known_faces(rebuild=True)
+        visitor_service.load_visitor_faces(rebuild=True)
+        print(f"✓ Loaded {len(face_recognition_service.gallery)} user faces, "
+              f"{len(visitor_service.gallery)} visitor faces")
+
+        print("\n" + "-" * 60)
+        print("✓ Migration complete!")
+
+
+if __name__ == "__main__":
+    migrate_face_encodings(sys.argv[1] if len(sys.argv) > 1 else 'float32')
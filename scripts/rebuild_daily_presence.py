@@ -0,0 +1,39 @@
+"""
+Rebuild the daily_presence rollup from student_tracking history
+
+Usage:
+    python scripts/rebuild_daily_presence.py [YYYY-MM-DD]
+
+With a date, only IST days on or after it are recomputed.
+"""
+
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db
+from services.daily_presence import rebuild_daily_presence
+from datetime import datetime
+
+app = create_app('development')
+
+
+def rebuild(start_date=None):
+    """Recompute the rollup, optionally from a start date"""
+    with app.app_context():
+        db.create_all()
+        
+        print("Rebuilding daily presence rollup" + (f" from {start_date}" if start_date else "") + "...")
+        print("-" * 60)
+        
+        count = rebuild_daily_presence(start_date)
+        
+        print(f"✓ Wrote {count} daily presence rows")
+        print("-" * 60)
+
+
+if __name__ == "__main__":
+    start = datetime.strptime(sys.argv[1], '%Y-%m-%d').date() if len(sys.argv) > 1 else None
+    rebuild(start)
@@ -18,12 +18,8 @@ def reload_faces():
         print("Reloading face recognition service...")
         print("-" * 60)
         
-        # Clear existing faces
-        face_recognition_service.known_faces = {}
-        face_recognition_service._faces_loaded = False
-        
-        # Reload faces
-        face_recognition_service.load_known_faces()
+        # Rebuild from the database (republishes the shared gallery if one is configured)
+        face_recognition_service.load_known_faces(rebuild=True)
         
         print(f"\n✓ Loaded {len(face_recognition_service.known_faces)} faces")
         
@@ -4,9 +4,8 @@ Uses MediaPipe Face Landmarker for head pose detection to determine if students
 """
 
 import cv2
+import threading
 import numpy as np
-from mediapipe.tasks import python
-from mediapipe.tasks.python import vision
 from typing import List, Dict, Tuple
 
 
@@ -14,23 +13,10 @@ class AttentionMonitoringService:
     """Service for monitoring student attention using head pose detection"""
     
     def __init__(self):
-        # Initialize MediaPipe Face Landmarker (v0.10.x API)
-        base_options = python.BaseOptions(model_asset_path='')  # Will use default model
-        options = vision.FaceLandmarkerOptions(
-            base_options=base_options,
-            running_mode=vision.RunningMode.IMAGE,
-            num_faces=30,  # Support up to 30 students
-            min_face_detection_confidence=0.5,
-            min_face_presence_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-        
-        try:
-            self.face_landmarker = vision.FaceLandmarker.create_from_options(options)
-        except Exception as e:
-            print(f"Warning: Could not initialize FaceLandmarker with model: {e}")
-            print("Falling back to simple face detection mode")
-            self.face_landmarker = None
+        # MediaPipe is imported and the landmarker built on first use
+        self._face_landmarker = None
+        self._landmarker_loaded = False
+        self._landmarker_lock = threading.Lock()
         
         # Attention thresholds (in degrees)
         self.PITCH_THRESHOLD = 30  # Looking down threshold
@@ -46,8 +32,49 @@ class AttentionMonitoringService:
             [-150.0, -150.0, -125.0],  # Left mouth corner
             [150.0, -150.0, -125.0]    # Right mouth corner
         ], dtype=np.float64)
+    
+    def _create_landmarker(self):
+        """Build the MediaPipe Face Landmarker (v0.10.x API), or None if unavailable"""
+        from mediapipe.tasks import python
+        from mediapipe.tasks.python import vision
+        
+        base_options = python.BaseOptions(model_asset_path='')  # Will use default model
+        options = vision.FaceLandmarkerOptions(
+            base_options=base_options,
+            running_mode=vision.RunningMode.IMAGE,
+            num_faces=30,  # Support up to 30 students
+            min_face_detection_confidence=0.5,
+            min_face_presence_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
         
-        print("Attention Monitoring Service initialized with MediaPipe Face Landmarker")
+        try:
+            landmarker = vision.FaceLandmarker.create_from_options(options)
+            print("Attention Monitoring Service initialized with MediaPipe Face Landmarker")
+            return landmarker
+        except Exception as e:
+            print(f"Warning: Could not initialize FaceLandmarker with model: {e}")
+            print("Falling back to simple face detection mode")
+            return None
+    
+    @property
+    def face_landmarker(self):
+        """The MediaPipe landmarker, built on first access"""
+        with self._landmarker_lock:
+            if not self._landmarker_loaded:
+                self._face_landmarker = self._create_landmarker()
+                self._landmarker_loaded = True
+        return self._face_landmarker
+    
+    def reinitialize(self):
+        """
+        Drop the landmarker so the next analysis builds a fresh one
+        
+        MediaPipe graphs own native threads that do not survive fork(), so a
+        forked worker must build its own instead of using the parent's.
+        """
+        self._face_landmarker = None
+        self._landmarker_loaded = False
     
     def analyze_attention(self, image_data):
         """
@@ -79,6 +106,7 @@ class AttentionMonitoringService:
                 return self._fallback_detection(rgb_image, w, h)
             
             # Create MediaPipe Image
+            from mediapipe.tasks import python
             mp_image = python.Image(image_format=python.ImageFormat.SRGB, data=rgb_image)
             
             # Detect faces
@@ -274,8 +302,8 @@ class AttentionMonitoringService:
     
     def __del__(self):
         """Cleanup resources"""
-        if hasattr(self, 'face_landmarker') and self.face_landmarker:
-            self.face_landmarker.close()
+        if getattr(self, '_face_landmarker', None):
+            self._face_landmarker.close()
 
 
 # Global attention monitoring service instance
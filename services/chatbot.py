@@ -1,9 +1,10 @@
-import google.generativeai as genai
 from flask import current_app
 from models import db, Event, Department, User, ChatHistory
 from models.student_tracking import StudentTracking
-from datetime import datetime, timedelta
-import pytz
+from services.presence import presence_service
+from services.daily_presence import present_today
+from datetime import datetime
+from utils.timezone import to_ist, ist_today, ist_day_range
 
 
 # Faculty and Staff Location Database
@@ -139,6 +140,7 @@ class ChatbotService:
     def initialize(self, api_key):
         """Initialize the Gemini model"""
         if api_key:
+            import google.generativeai as genai
             genai.configure(api_key=api_key)
             # Use gemini-2.5-flash - latest stable model
             self.model = genai.GenerativeModel('models/gemini-2.5-flash')
@@ -189,9 +191,8 @@ class ChatbotService:
             return None
         
         # Get availability status
-        ist = pytz.timezone('Asia/Kolkata')
-        today_start = datetime.now(ist).replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = today_start + timedelta(days=1)
+        # Today's IST day as a UTC range (stored timestamps are UTC)
+        today_start, today_end = ist_day_range(ist_today())
         
         tracking_records = StudentTracking.query.filter(
             StudentTracking.user_id == faculty.id,
@@ -204,7 +205,7 @@ class ChatbotService:
         
         if tracking_records:
             last_record = tracking_records[0]
-            last_entry_time = last_record.timestamp.astimezone(ist).strftime('%I:%M %p')
+            last_entry_time = to_ist(last_record.timestamp).strftime('%I:%M %p')
             
             if last_record.entry_type == 'IN':
                 availability_status = f"Currently in university (entered at {last_entry_time})"
@@ -451,8 +452,6 @@ User's question: {user_message}
     
     def check_person_availability(self, person_name):
         """Check if a specific person is currently in the university"""
-        import pytz
-        
         # Search for the user by name
         user = User.query.filter(
             db.or_(
@@ -465,24 +464,8 @@ User's question: {user_message}
         if not user:
             return None, "Person not found in the system."
         
-        # Get today's date in IST
-        ist = pytz.timezone('Asia/Kolkata')
-        now_ist = datetime.now(ist)
-        today_ist = now_ist.date()
-        
-        # Get all tracking records for this user
-        all_tracking_records = StudentTracking.query.filter(
-            StudentTracking.user_id == user.id
-        ).order_by(StudentTracking.timestamp.desc()).all()
-        
-        # Filter records for today in IST
-        tracking_records = []
-        for record in all_tracking_records:
-            # Convert UTC timestamp to IST
-            utc_time = record.timestamp.replace(tzinfo=pytz.UTC)
-            ist_time = utc_time.astimezone(ist)
-            if ist_time.date() == today_ist:
-                tracking_records.append(record)
+        # Latest entry today (IST) from the in-memory presence table
+        last_entry = presence_service.today_entry(user.id)
         
         # Build detailed user information
         response = f"**{user.full_name}**\n\n"
@@ -507,15 +490,11 @@ User's question: {user_message}
         response += f"📧 Email: {user.email}\n\n"
         
         # Check presence status
-        if not tracking_records:
+        if not last_entry:
             response += f"❌ **Status**: Has not entered the university today."
         else:
-            # Check the last entry
-            last_entry = tracking_records[0]
-            
             # Convert entry time to IST for display
-            utc_time = last_entry.timestamp.replace(tzinfo=pytz.UTC)
-            ist_time = utc_time.astimezone(ist)
+            ist_time = to_ist(last_entry.timestamp)
             
             if last_entry.entry_type == 'IN':
                 # Person is currently in the university
@@ -539,48 +518,13 @@ User's question: {user_message}
     
     def get_all_present_people(self, role=None):
         """Get all people currently present in the university"""
-        import pytz
-        
-        # Get today's date in IST
-        ist = pytz.timezone('Asia/Kolkata')
-        now_ist = datetime.now(ist)
-        today_ist = now_ist.date()
-        
-        # Get all tracking records
-        query = db.session.query(User, StudentTracking).join(
-            StudentTracking, User.id == StudentTracking.user_id
-        )
-        
-        if role:
-            query = query.filter(User.role == role)
-        
-        # Get all tracking records
-        all_records = query.all()
-        
-        # Filter for today in IST and group by user
-        user_status = {}
-        for user, tracking in all_records:
-            # Convert UTC timestamp to IST
-            utc_time = tracking.timestamp.replace(tzinfo=pytz.UTC)
-            ist_time = utc_time.astimezone(ist)
-            
-            # Only include records from today (IST)
-            if ist_time.date() == today_ist:
-                if user.id not in user_status:
-                    user_status[user.id] = {'user': user, 'entries': []}
-                user_status[user.id]['entries'].append(tracking)
-        
-        # Determine who is currently present
+        # Today's daily_presence rollup: one indexed query instead of a history scan
         present_users = []
-        for user_id, data in user_status.items():
-            # Sort entries by timestamp descending
-            sorted_entries = sorted(data['entries'], key=lambda x: x.timestamp, reverse=True)
-            # Check if last entry is IN
-            if sorted_entries[0].entry_type == 'IN':
-                present_users.append({
-                    'user': data['user'],
-                    'entry_time': sorted_entries[0].timestamp
-                })
+        for user, presence in present_today(role):
+            present_users.append({
+                'user': user,
+                'entry_time': presence.last_entry_at
+            })
         
         return present_users
     
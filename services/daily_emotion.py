@@ -0,0 +1,146 @@
+"""
+Daily emotion rollup maintenance
+Folds emotion samples into daily_emotion incrementally, rebuilds it from history
+and answers the counselor's sad-streak query from the rollup
+"""
+
+from datetime import timedelta
+from sqlalchemy.orm import joinedload
+from models import db, User, EmotionTracking
+from models.daily_emotion import DailyEmotion
+from utils.timezone import ist_date, ist_today
+
+
+def _fold(rows, user_id, emotion, confidence, timestamp):
+    """Apply one sample to its (user, IST date) row in rows, creating it if needed"""
+    day = ist_date(timestamp)
+    row = rows.get((user_id, day))
+    created = row is None
+    if created:
+        row = DailyEmotion(user_id=user_id, date=day, sample_count=0, confidence_sum=0.0, sad_streak=0)
+        rows[(user_id, day)] = row
+    row.apply(emotion, confidence, timestamp, rows.get((user_id, day - timedelta(days=1))))
+    return row, created
+
+
+def update_daily_emotion(samples):
+    """
+    Fold new EmotionTracking samples into their (user, IST date) rollup rows
+
+    Runs in the caller's session so the rollup commits in the same transaction
+    as the emotion rows. Existing rows for the batch, and the day before each
+    (for the sad streak), are loaded in one query. Samples backfilled into
+    days older than the latest row do not re-number later streaks; run
+    rebuild_daily_emotion for that.
+    """
+    keys = {(sample.user_id, ist_date(sample.timestamp)) for sample in samples}
+    if not keys:
+        return
+
+    user_ids = {user_id for user_id, _ in keys}
+    dates = {day for _, day in keys} | {day - timedelta(days=1) for _, day in keys}
+    rows = {
+        (row.user_id, row.date): row
+        for row in DailyEmotion.query.filter(
+            DailyEmotion.user_id.in_(user_ids),
+            DailyEmotion.date.in_(dates)
+        ).all()
+    }
+
+    for sample in sorted(samples, key=lambda sample: sample.timestamp):
+        row, created = _fold(rows, sample.user_id, sample.dominant_emotion, sample.confidence, sample.timestamp)
+        if created:
+            db.session.add(row)
+
+
+def rebuild_daily_emotion(start_date=None, batch_size=1000):
+    """
+    Recompute daily_emotion from emotion_tracking
+
+    Args:
+        start_date: only rebuild IST days on or after this date (default: all history)
+
+    Returns:
+        int: number of rollup rows written
+    """
+    delete_query = DailyEmotion.query
+    if start_date:
+        delete_query = delete_query.filter(DailyEmotion.date >= start_date)
+    delete_query.delete(synchronize_session='fetch')
+
+    rows = {}
+    if start_date:
+        # Streaks running into start_date continue from the kept rows
+        day_before = start_date - timedelta(days=1)
+        rows = {
+            (row.user_id, row.date): row
+            for row in DailyEmotion.query.filter(DailyEmotion.date == day_before).all()
+        }
+    kept = set(rows)
+
+    query = db.session.query(
+        EmotionTracking.user_id,
+        EmotionTracking.dominant_emotion,
+        EmotionTracking.confidence,
+        EmotionTracking.timestamp
+    ).order_by(EmotionTracking.timestamp, EmotionTracking.id)
+
+    for user_id, emotion, confidence, timestamp in query.yield_per(batch_size):
+        if start_date and ist_date(timestamp) < start_date:
+            continue
+        _fold(rows, user_id, emotion, confidence, timestamp)
+
+    written = [row for key, row in rows.items() if key not in kept]
+    db.session.add_all(written)
+    db.session.commit()
+    return len(written)
+
+
+def sad_streak_students(days=7, min_streak=2):
+    """
+    Students with a run of at least min_streak consecutive sad IST days inside
+    the last `days` days, in one query over the rollup
+
+    A day counts as sad when any of its samples was sad.
+
+    Returns:
+        list of (User, number of sad days in the window), longest streak first
+    """
+    start = ist_today() - timedelta(days=days - 1)
+    # A streak ending on `date` began min_streak - 1 days earlier; keep it inside the window
+    streak_ends = start + timedelta(days=min_streak - 1)
+
+    window = db.session.query(
+        DailyEmotion.user_id.label('user_id'),
+        db.func.sum(db.case((DailyEmotion.sad_count > 0, 1), else_=0)).label('sad_days'),
+        db.func.max(db.case((DailyEmotion.date >= streak_ends, DailyEmotion.sad_streak), else_=0)).label('streak')
+    ).filter(
+        DailyEmotion.date >= start
+    ).group_by(DailyEmotion.user_id).subquery()
+
+    return db.session.query(User, window.c.sad_days).join(
+        window, User.id == window.c.user_id
+    ).options(
+        joinedload(User.department),
+        joinedload(User.program)
+    ).filter(
+        User.role == 'Student',
+        window.c.streak >= min_streak
+    ).order_by(window.c.streak.desc(), User.full_name).all()
+
+
+def recent_days(user_ids, days=7, limit=5):
+    """Latest `limit` rollup rows per user within the last `days` days, newest first, in one query"""
+    recent = {user_id: [] for user_id in user_ids}
+    if not user_ids:
+        return recent
+
+    rows = DailyEmotion.query.filter(
+        DailyEmotion.user_id.in_(user_ids),
+        DailyEmotion.date >= ist_today() - timedelta(days=days - 1)
+    ).order_by(DailyEmotion.user_id, DailyEmotion.date.desc()).all()
+
+    for row in rows:
+        if len(recent[row.user_id]) < limit:
+            recent[row.user_id].append(row)
+    return recent
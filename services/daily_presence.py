@@ -0,0 +1,105 @@
+"""
+Daily presence rollup maintenance
+Folds tracking entries into daily_presence incrementally and rebuilds it from history
+"""
+
+from models import db, User
+from models.daily_presence import DailyPresence
+from models.student_tracking import StudentTracking
+from utils.timezone import ist_date, ist_today
+
+
+def update_daily_presence(entries):
+    """
+    Fold new tracking entries into their (user, IST date) rollup rows
+
+    Runs in the caller's session so the rollup commits in the same transaction
+    as the tracking rows. Existing rows for the batch are loaded in one query.
+    """
+    keys = {(entry.user_id, ist_date(entry.timestamp)) for entry in entries}
+    if not keys:
+        return
+
+    user_ids = {user_id for user_id, _ in keys}
+    dates = {day for _, day in keys}
+    rows = {
+        (row.user_id, row.date): row
+        for row in DailyPresence.query.filter(
+            DailyPresence.user_id.in_(user_ids),
+            DailyPresence.date.in_(dates)
+        ).all()
+    }
+
+    for entry in sorted(entries, key=lambda entry: entry.timestamp):
+        key = (entry.user_id, ist_date(entry.timestamp))
+        row = rows.get(key)
+        if row is None:
+            row = DailyPresence(user_id=entry.user_id, date=key[1], entry_count=0)
+            db.session.add(row)
+            rows[key] = row
+        row.apply(entry.entry_type, entry.timestamp, entry.location)
+
+
+def rebuild_daily_presence(start_date=None, batch_size=1000):
+    """
+    Recompute daily_presence from student_tracking
+
+    Args:
+        start_date: only rebuild IST days on or after this date (default: all history)
+
+    Returns:
+        int: number of rollup rows written
+    """
+    delete_query = DailyPresence.query
+    if start_date:
+        delete_query = delete_query.filter(DailyPresence.date >= start_date)
+    delete_query.delete(synchronize_session=False)
+
+    query = db.session.query(
+        StudentTracking.user_id,
+        StudentTracking.entry_type,
+        StudentTracking.timestamp,
+        StudentTracking.location
+    ).order_by(StudentTracking.timestamp, StudentTracking.id)
+
+    rows = {}
+    for user_id, entry_type, timestamp, location in query.yield_per(batch_size):
+        day = ist_date(timestamp)
+        if start_date and day < start_date:
+            continue
+        row = rows.get((user_id, day))
+        if row is None:
+            row = DailyPresence(user_id=user_id, date=day, entry_count=0)
+            rows[(user_id, day)] = row
+        row.apply(entry_type, timestamp, location)
+
+    db.session.add_all(rows.values())
+    db.session.commit()
+    return len(rows)
+
+
+def present_today(role=None):
+    """(User, DailyPresence) pairs for everyone whose latest entry today is IN, most recent first"""
+    query = db.session.query(User, DailyPresence).join(
+        DailyPresence, User.id == DailyPresence.user_id
+    ).filter(
+        DailyPresence.date == ist_today(),
+        DailyPresence.current_state == 'IN'
+    )
+    if role:
+        query = query.filter(User.role == role)
+    return query.order_by(DailyPresence.last_entry_at.desc()).all()
+
+
+def today_summary():
+    """Counts for today's rollup: people seen, currently inside and total entries"""
+    visited, present, entries = db.session.query(
+        db.func.count(DailyPresence.id),
+        db.func.sum(db.case((DailyPresence.current_state == 'IN', 1), else_=0)),
+        db.func.sum(DailyPresence.entry_count)
+    ).filter(DailyPresence.date == ist_today()).one()
+    return {
+        'visited': visited or 0,
+        'present': int(present or 0),
+        'entries': int(entries or 0)
+    }
@@ -0,0 +1,68 @@
+"""
+Per-user emotion cache and sampling window
+Reuses a recognized user's recent emotion result instead of re-running DeepFace,
+and caps stored EmotionTracking samples to one per user per sampling interval
+"""
+
+import threading
+import time
+
+
+class EmotionCache:
+    """
+    Latest emotion result per recognized user
+
+    get() serves a result for ttl seconds after it was analyzed, so the gate,
+    the visitor display and the chat photo of the same person within a minute
+    cost one analysis. should_store() lets one EmotionTracking sample per user
+    through every sample_interval seconds.
+
+    Like the presence table the cache is per process, so with several workers
+    each may store one sample per interval.
+    """
+
+    def __init__(self, ttl=60, sample_interval=600):
+        self.ttl = ttl
+        self.sample_interval = sample_interval
+        self._results = {}  # user_id -> (monotonic time, result)
+        self._stored_at = {}  # user_id -> monotonic time of the last stored sample
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Read the cache lifetime and sampling interval from the app config"""
+        self.ttl = app.config.get('EMOTION_CACHE_SECONDS', self.ttl)
+        self.sample_interval = app.config.get('EMOTION_SAMPLE_MINUTES', self.sample_interval / 60) * 60
+
+    def get(self, user_id):
+        """Cached emotion result for a user, or None if there is none or it expired"""
+        if not self.ttl:
+            return None
+        with self._lock:
+            cached = self._results.get(user_id)
+        if cached is None or time.monotonic() - cached[0] > self.ttl:
+            return None
+        return cached[1]
+
+    def put(self, user_id, result):
+        """Remember a successful analysis for the user"""
+        if result and result.get('success') and not result.get('pending'):
+            with self._lock:
+                self._results[user_id] = (time.monotonic(), result)
+
+    def should_store(self, user_id):
+        """
+        True if a new EmotionTracking sample may be stored for the user now
+
+        Claims the slot: the next call within sample_interval returns False.
+        """
+        now = time.monotonic()
+        with self._lock:
+            last = self._stored_at.get(user_id)
+            if last is not None and now - last < self.sample_interval:
+                return False
+            self._stored_at[user_id] = now
+            return True
+
+
+# Global emotion cache instance
+emotion_cache = EmotionCache()
@@ -4,56 +4,205 @@ Analyzes facial expressions and provides emotion data for personalized greetings
 """
 
 import cv2
+import os
+import queue
+import threading
+import time
 import numpy as np
-from deepface import DeepFace
 import base64
-from io import BytesIO
-from PIL import Image
+
+
+# DeepFace attribute model behind each analysis action
+ACTION_MODELS = {
+    'emotion': 'Emotion',
+    'age': 'Age',
+    'gender': 'Gender',
+}
+
+# Actions run when a caller does not ask for more: the kiosk, gate and
+# counselor views only use the emotion, and each extra action is another CNN
+DEFAULT_ACTIONS = ('emotion',)
+
+# Context kept around an already-detected face box before skipping detection
+FACE_CROP_MARGIN = 0.1
+
+# Input of DeepFace's emotion CNN: 48x48 grayscale scaled to [0, 1]
+EMOTION_INPUT_SIZE = (48, 48)
+
+
+class _BatchRequest:
+    """A face crop waiting for the next batched forward pass"""
+
+    __slots__ = ('crop', 'result', 'done')
+
+    def __init__(self, crop):
+        self.crop = crop
+        self.result = None
+        self.done = threading.Event()
 
 
 class EmotionDetectionService:
     """Service for detecting emotions and analyzing facial expressions"""
     
-    def __init__(self):
+    def __init__(self, batch_size=16, batch_wait=0.005):
         self.emotions = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+        self.actions = list(DEFAULT_ACTIONS)  # models built and warmed by initialize(); age/gender load on first use
         self.initialized = False
+        self.error = None
+        self.warmup_seconds = None
+        self._models = {}  # action -> built DeepFace model, held for the process lifetime
+        self._init_lock = threading.Lock()
+        self._warmup_thread = None
+        self._warmup_pid = None
+        self._warmup_lock = threading.Lock()
+        
+        # Micro-batching of concurrent emotion-only face analyses
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self._batch_queue = queue.Queue()
+        self._batch_thread = None
+        self._batch_pid = None
+        self._batch_lock = threading.Lock()
+    
+    def init_app(self, app):
+        """Read micro-batching settings from the app config (batch_size 1 disables it)"""
+        self.batch_size = app.config.get('EMOTION_BATCH_SIZE', self.batch_size)
+        self.batch_wait = app.config.get('EMOTION_BATCH_WAIT_MS', self.batch_wait * 1000) / 1000.0
         
     def initialize(self):
-        """Initialize the emotion detection model"""
+        """
+        Build the emotion model and run one dummy inference
+        
+        DeepFace otherwise loads its models (downloading weights if needed)
+        inside the first analyze() call, and TensorFlow allocates its buffers
+        on the first forward pass; doing both here keeps that cost off the
+        first real request. The age and gender models (hundreds of MB each)
+        are only built by the first analysis that asks for them, so pool
+        processes serving the emotion-only default never load them. Safe to
+        call more than once.
+        
+        Returns:
+            bool: True when the models are loaded and warm
+        """
+        with self._init_lock:
+            if self.initialized:
+                return True
+            try:
+                from deepface import DeepFace
+                
+                start = time.perf_counter()
+                for action in self.actions:
+                    self._models[action] = self._build_model(DeepFace, ACTION_MODELS[action])
+                
+                DeepFace.analyze(
+                    img_path=np.zeros((224, 224, 3), dtype=np.uint8),
+                    actions=self.actions,
+                    enforce_detection=False,
+                    detector_backend='opencv'
+                )
+                # ...and the batched emotion path used for face crops
+                self.analyze_faces([np.zeros((48, 48, 3), dtype=np.uint8)])
+                
+                self.warmup_seconds = time.perf_counter() - start
+                self.error = None
+                self.initialized = True
+                print(f"Emotion Detection Service initialized ({self.warmup_seconds:.1f}s warm-up)")
+                return True
+            except Exception as e:
+                self.error = str(e)
+                print(f"Error initializing emotion detection: {str(e)}")
+                return False
+    
+    def initialize_in_background(self):
+        """
+        Run initialize() on a daemon thread, once per process
+        
+        For processes where init_worker() never ran (e.g. the app served by
+        `flask run`), so the first health check or emotion request starts the
+        warm-up instead of the models staying cold. A failed warm-up is
+        reported by health() and not retried.
+        """
+        if self.initialized:
+            return
+        with self._warmup_lock:
+            if self._warmup_thread is not None and self._warmup_pid == os.getpid():
+                return
+            self._warmup_pid = os.getpid()
+            self._warmup_thread = threading.Thread(target=self.initialize, name='emotion-warmup', daemon=True)
+            self._warmup_thread.start()
+    
+    @staticmethod
+    def _build_model(DeepFace, model_name):
+        """Build (and let DeepFace cache) one attribute model"""
         try:
-            # DeepFace will download models on first use
-            print("Emotion Detection Service initialized")
-            self.initialized = True
-            return True
-        except Exception as e:
-            print(f"Error initializing emotion detection: {str(e)}")
-            return False
+            return DeepFace.build_model(model_name=model_name, task='facial_attribute')
+        except TypeError:
+            # DeepFace releases before the task argument
+            return DeepFace.build_model(model_name)
     
-    def analyze_emotion(self, image_data):
+    def _ensure_models(self, actions):
+        """Build any model an analysis needs that initialize() did not (age, gender)"""
+        if all(action in self._models for action in actions):
+            return
+        from deepface import DeepFace
+        with self._init_lock:
+            for action in actions:
+                if action not in self._models:
+                    print(f"Loading DeepFace {ACTION_MODELS[action]} model on first use")
+                    self._models[action] = self._build_model(DeepFace, ACTION_MODELS[action])
+    
+    def health(self):
+        """Readiness report for the health endpoint"""
+        return {
+            'ready': self.initialized,
+            'models': sorted(self._models),
+            'warmup_seconds': round(self.warmup_seconds, 2) if self.warmup_seconds is not None else None,
+            'error': self.error
+        }
+    
+    def _resolve_actions(self, actions):
+        """Requested actions in model order, always including the emotion"""
+        requested = set(actions or DEFAULT_ACTIONS) | {'emotion'}
+        unknown = requested - set(ACTION_MODELS)
+        if unknown:
+            raise ValueError(f"Unsupported emotion actions: {', '.join(sorted(unknown))}")
+        return [action for action in ACTION_MODELS if action in requested]
+    
+    def analyze_emotion(self, image_data, actions=None, detector_backend='opencv'):
         """
         Analyze emotion from image data
         
         Args:
             image_data: Image as numpy array, PIL Image, or file path
+            actions: DeepFace actions to run, any of 'emotion', 'age', 'gender'
+                (default: emotion only; age and gender are None unless requested)
+            detector_backend: DeepFace face detector; 'skip' treats the whole
+                image as the face (see analyze_face)
             
         Returns:
             dict: {
                 'success': bool,
                 'dominant_emotion': str,
                 'emotions': dict,
-                'age': int,
-                'gender': str,
+                'age': int or None,
+                'gender': str or None,
                 'confidence': float,
                 'greeting_message': str
             }
         """
         try:
+            actions = self._resolve_actions(actions)
+            
+            # DeepFace pulls in TensorFlow, so it is imported on first analysis
+            from deepface import DeepFace
+            self._ensure_models(actions)
+            
             # Analyze the image using DeepFace
             analysis = DeepFace.analyze(
                 img_path=image_data,
-                actions=['emotion', 'age', 'gender'],
+                actions=actions,
                 enforce_detection=False,  # Don't fail if face not detected
-                detector_backend='opencv'  # Fast detector
+                detector_backend=detector_backend
             )
             
             # Handle both single face and multiple faces
@@ -63,8 +212,8 @@ class EmotionDetectionService:
             # Extract emotion data
             emotions = analysis.get('emotion', {})
             dominant_emotion = analysis.get('dominant_emotion', 'neutral')
-            age = analysis.get('age', 25)
-            gender = analysis.get('dominant_gender', 'Unknown')
+            age = int(analysis.get('age', 25)) if 'age' in actions else None
+            gender = analysis.get('dominant_gender', 'Unknown') if 'gender' in actions else None
             
             # Calculate confidence (highest emotion score)
             confidence = max(emotions.values()) / 100.0 if emotions else 0.5
@@ -80,7 +229,7 @@ class EmotionDetectionService:
                 'success': True,
                 'dominant_emotion': dominant_emotion,
                 'emotions': emotions,
-                'age': int(age),
+                'age': age,
                 'gender': gender,
                 'confidence': confidence,
                 'greeting_message': greeting_message
@@ -96,6 +245,147 @@ class EmotionDetectionService:
                 'greeting_message': ''
             }
     
+    def analyze_face(self, image, box, actions=None):
+        """
+        Analyze emotion of a face that has already been located
+        
+        Crops the (top, right, bottom, left) box from the BGR frame and runs
+        DeepFace with detector_backend='skip', so recognition and emotion share
+        one detection and the model only sees the small face crop. Emotion-only
+        requests are micro-batched with concurrent callers (see analyze_faces).
+        """
+        from services.face_detection import crop_box
+        
+        crop = crop_box(image, box, FACE_CROP_MARGIN)
+        if crop.size == 0:
+            return self.analyze_emotion(image, actions)
+        if self.batch_size > 1 and self._emotion_only(actions):
+            return self._analyze_batched(crop)
+        return self.analyze_emotion(crop, actions, detector_backend='skip')
+    
+    def _emotion_only(self, actions):
+        return self._resolve_actions(actions) == ['emotion']
+    
+    def analyze_faces(self, crops):
+        """
+        Emotion of several face crops in one batched forward pass
+        
+        Crops are preprocessed the way DeepFace's emotion model expects
+        (grayscale, 48x48, scaled to [0, 1]) and stacked into a single batch.
+        Falls back to one analyze_emotion() call per crop if the model cannot
+        be driven directly.
+        
+        Returns:
+            list of emotion results (same shape as analyze_emotion, emotion only)
+        """
+        if not crops:
+            return []
+        try:
+            model = self._emotion_model()
+            batch = np.stack([self._emotion_input(crop) for crop in crops])
+            try:
+                predictions = model.predict(batch, verbose=0)
+            except TypeError:
+                predictions = model.predict(batch)
+        except Exception as e:
+            print(f"Batched emotion inference unavailable, analyzing one by one: {e}")
+            return [self.analyze_emotion(crop, ['emotion'], detector_backend='skip') for crop in crops]
+        
+        results = []
+        for prediction in np.asarray(predictions, dtype=np.float64):
+            total = prediction.sum() or 1.0
+            emotions = {label: float(100 * score / total) for label, score in zip(self.emotions, prediction)}
+            dominant_emotion = max(emotions, key=emotions.get)
+            confidence = emotions[dominant_emotion] / 100.0
+            results.append({
+                'success': True,
+                'dominant_emotion': dominant_emotion,
+                'emotions': emotions,
+                'age': None,
+                'gender': None,
+                'confidence': confidence,
+                'greeting_message': self._generate_greeting_message(dominant_emotion, confidence, None)
+            })
+        return results
+    
+    def analyze_batch(self, items):
+        """
+        Analyze a batch of queued jobs, each (image, actions, detector_backend)
+        
+        Emotion-only face crops share one forward pass; anything else (full
+        frames, age/gender requests) goes through analyze_emotion.
+        """
+        results = [None] * len(items)
+        batched = [
+            index for index, (image, actions, detector_backend) in enumerate(items)
+            if detector_backend == 'skip' and self._emotion_only(actions)
+        ]
+        for index, result in zip(batched, self.analyze_faces([items[index][0] for index in batched])):
+            results[index] = result
+        for index, (image, actions, detector_backend) in enumerate(items):
+            if results[index] is None:
+                results[index] = self.analyze_emotion(image, actions, detector_backend=detector_backend)
+        return results
+    
+    def _emotion_model(self):
+        """Keras model behind DeepFace's emotion client (built on first use)"""
+        model = self._models.get('emotion')
+        if model is None:
+            from deepface import DeepFace
+            model = self._models['emotion'] = self._build_model(DeepFace, ACTION_MODELS['emotion'])
+        return getattr(model, 'model', model)
+    
+    @staticmethod
+    def _emotion_input(crop):
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+        gray = cv2.resize(gray, EMOTION_INPUT_SIZE)
+        return np.expand_dims(gray.astype(np.float32) / 255.0, axis=-1)
+    
+    def _analyze_batched(self, crop):
+        """Queue a crop for the batch thread and wait for its result"""
+        self._ensure_batch_thread()
+        request = _BatchRequest(crop)
+        self._batch_queue.put(request)
+        request.done.wait()
+        return request.result
+    
+    def _ensure_batch_thread(self):
+        # Threads do not survive fork: start one lazily in each worker process
+        if self._batch_thread is None or self._batch_pid != os.getpid() or not self._batch_thread.is_alive():
+            with self._batch_lock:
+                if self._batch_thread is None or self._batch_pid != os.getpid() or not self._batch_thread.is_alive():
+                    self._batch_pid = os.getpid()
+                    self._batch_thread = threading.Thread(target=self._run_batches, name='emotion-batcher', daemon=True)
+                    self._batch_thread.start()
+    
+    def _run_batches(self):
+        # Collect crops for up to batch_wait seconds (or batch_size crops), then one forward pass
+        while True:
+            batch = [self._batch_queue.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._batch_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                results = self.analyze_faces([request.crop for request in batch])
+            except Exception as e:
+                print(f"Error in batched emotion analysis: {e}")
+                results = [{
+                    'success': False,
+                    'error': str(e),
+                    'dominant_emotion': 'neutral',
+                    'emotions': {},
+                    'greeting_message': ''
+                }] * len(batch)
+            for request, result in zip(batch, results):
+                request.result = result
+                request.done.set()
+    
     def _generate_greeting_message(self, emotion, confidence, gender):
         """Generate personalized greeting based on emotion"""
         
@@ -136,21 +426,28 @@ class EmotionDetectionService:
         # Return first message (can be randomized later)
         return emotion_messages[0] if emotion_messages else ""
     
-    def analyze_from_base64(self, base64_image):
+    def decode_base64(self, base64_image):
+        """Decode a base64 (or data URL) image into a BGR numpy array"""
+        # Decode base64 image
+        image_data = base64.b64decode(base64_image.split(',')[1] if ',' in base64_image else base64_image)
+        return self.decode_image(image_data)
+    
+    def decode_image(self, image_data):
+        """
+        Decode encoded image bytes (JPEG, PNG, ...) into a 3-channel BGR numpy array, in memory
+        
+        Same result as cv2.imread on a saved file: grayscale, palette and alpha
+        images come back as BGR and EXIF orientation is applied.
+        """
+        image = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Could not decode image")
+        return image
+    
+    def analyze_from_base64(self, base64_image, actions=None):
         """Analyze emotion from base64 encoded image"""
         try:
-            # Decode base64 image
-            image_data = base64.b64decode(base64_image.split(',')[1] if ',' in base64_image else base64_image)
-            image = Image.open(BytesIO(image_data))
-            
-            # Convert to numpy array
-            img_array = np.array(image)
-            
-            # Convert RGB to BGR for OpenCV
-            if len(img_array.shape) == 3 and img_array.shape[2] == 3:
-                img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-            
-            return self.analyze_emotion(img_array)
+            return self.analyze_emotion(self.decode_base64(base64_image), actions)
             
         except Exception as e:
             print(f"Error processing base64 image: {str(e)}")
@@ -162,10 +459,24 @@ class EmotionDetectionService:
                 'greeting_message': ''
             }
     
-    def analyze_from_file(self, file_path):
+    def analyze_from_bytes(self, image_data, actions=None):
+        """Analyze emotion from encoded image bytes (e.g. an upload) without touching disk"""
+        try:
+            return self.analyze_emotion(self.decode_image(image_data), actions)
+        except Exception as e:
+            print(f"Error processing image bytes: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e),
+                'dominant_emotion': 'neutral',
+                'emotions': {},
+                'greeting_message': ''
+            }
+    
+    def analyze_from_file(self, file_path, actions=None):
         """Analyze emotion from image file"""
         try:
-            return self.analyze_emotion(file_path)
+            return self.analyze_emotion(file_path, actions)
         except Exception as e:
             print(f"Error analyzing file: {str(e)}")
             return {
@@ -0,0 +1,315 @@
+"""
+Background emotion inference
+Runs DeepFace in a pool of worker processes behind a bounded queue, so gate and
+kiosk requests return immediately with a job id instead of waiting on TensorFlow
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+def _init_process(ready_queue):
+    """Runs once in each pool process as it starts: load and warm the models, then report in"""
+    from services.emotion_detection import emotion_service
+    ready = emotion_service.initialize()
+    ready_queue.put((os.getpid(), ready))
+
+
+def _spawn():
+    """Trivial task submitted once per worker so every process is started (and warmed) up front"""
+    return os.getpid()
+
+
+def _analyze(items):
+    """Runs in a pool process: a batch of (image, actions, detector_backend) jobs"""
+    from services.emotion_detection import emotion_service
+    return emotion_service.analyze_batch(items)
+
+
+class EmotionJob:
+    """One queued emotion analysis; result is set once the pool has run it"""
+
+    __slots__ = ('id', 'key', 'image', 'detector_backend', 'actions', 'callback', 'result', 'created_at', '_done')
+
+    def __init__(self, image, detector_backend='opencv', actions=None, key=None, callback=None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.image = image
+        self.detector_backend = detector_backend
+        self.actions = actions
+        self.callback = callback
+        self.result = None
+        self.created_at = time.monotonic()
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the result is ready (or timeout); returns the result or None"""
+        self._done.wait(timeout)
+        return self.result
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': 'done' if self.done else 'pending',
+            'result': self.result
+        }
+
+
+class EmotionPool:
+    """
+    Process pool for emotion inference with a bounded queue
+
+    At most two tasks per process are handed to the executor at a time; the rest
+    wait here, up to max_queue jobs. Each task takes up to batch_size waiting
+    jobs, so under load face crops share one batched forward pass while a
+    quiet pool still runs every job as soon as it arrives. A job submitted with the key of one still
+    waiting (the same user or camera track) replaces that job's frame instead of
+    queueing twice. When the queue is full new jobs are dropped, so the gate
+    never stalls behind emotion analysis.
+
+    The pool uses spawned processes (TensorFlow does not survive fork) and is
+    started lazily in each web worker. Each process warms its models as it
+    starts and reports its pid, so the pool is ready once every process has.
+    If a process dies (crash, OOM) the executor is broken: the jobs it held
+    fail and a fresh executor is started for the rest. workers=0 disables the
+    pool: callers then run emotion_service inline as before.
+    """
+
+    def __init__(self, workers=0, max_queue=32, result_ttl=60, batch_size=16):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.result_ttl = result_ttl
+        self.dropped = 0
+        self.restarts = 0
+        self._executor = None
+        self._pid = None
+        self._ready_queue = None
+        self._warm_pids = set()  # pool processes that have warmed their models
+        self._futures = set()  # batches running on the current executor
+        self._pending = OrderedDict()  # job id -> EmotionJob, oldest first
+        self._jobs = OrderedDict()  # job id -> EmotionJob, for result lookups
+        self._lock = threading.RLock()
+
+    def init_app(self, app):
+        """Read pool sizing from the app config"""
+        self.workers = app.config.get('EMOTION_POOL_WORKERS', self.workers)
+        self.max_queue = app.config.get('EMOTION_POOL_MAX_QUEUE', self.max_queue)
+        self.result_ttl = app.config.get('EMOTION_JOB_TTL', self.result_ttl)
+        self.batch_size = max(1, app.config.get('EMOTION_BATCH_SIZE', self.batch_size))
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def start(self):
+        """Start the worker processes (once per web process) and warm their models"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                # Executor threads and pipes are not inherited across fork
+                self._pending.clear()
+                self._jobs.clear()
+            self._pid = os.getpid()
+            self._futures = set()
+            self._warm_pids = set()
+            context = multiprocessing.get_context('spawn')
+            self._ready_queue = context.Queue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_process,
+                initargs=(self._ready_queue,)
+            )
+            for _ in range(self.workers):
+                self._executor.submit(_spawn)
+        print(f"Emotion pool started with {self.workers} worker processes")
+
+    def _restart(self, reason):
+        # Called with the lock held: drop the broken executor and start a new one
+        print(f"Emotion pool broken ({reason}), restarting it")
+        executor, self._executor = self._executor, None
+        self._futures = set()
+        self.restarts += 1
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.start()
+
+    def submit(self, image, box=None, actions=None, key=None, callback=None):
+        """
+        Queue an emotion analysis
+
+        Args:
+            image: BGR frame (numpy array) or image file path
+            box: optional (top, right, bottom, left) face box; only its crop is
+                sent to the pool and analyzed without a second detection
+            key: coalescing key; a waiting job with the same key is replaced
+            callback: called with the result dict once it is ready (pool thread)
+
+        Returns:
+            EmotionJob, or None if the queue is full and the job was dropped
+        """
+        detector_backend = 'opencv'
+        if box is not None:
+            from services.emotion_detection import FACE_CROP_MARGIN
+            from services.face_detection import crop_box
+            crop = crop_box(image, box, FACE_CROP_MARGIN)
+            if crop.size:
+                image, detector_backend = crop, 'skip'
+
+        self.start()
+        with self._lock:
+            self._prune()
+
+            if key is not None:
+                for job in self._pending.values():
+                    if job.key == key:
+                        # Newest frame wins; the caller polls the same job
+                        job.image, job.detector_backend = image, detector_backend
+                        job.actions, job.callback = actions, callback
+                        return job
+
+            if len(self._pending) >= self.max_queue:
+                self.dropped += 1
+                return None
+
+            job = EmotionJob(image, detector_backend, actions, key, callback)
+            self._pending[job.id] = job
+            self._jobs[job.id] = job
+            failed = self._dispatch()
+
+        for jobs, error in failed:
+            self._complete(jobs, error=error)
+        return job
+
+    def run(self, image, box=None, actions=None, timeout=10):
+        """Analyze through the pool and wait; returns None if dropped or timed out"""
+        job = self.submit(image, box, actions)
+        if job is None:
+            return None
+        return job.wait(timeout)
+
+    def get(self, job_id):
+        """A submitted job by id, or None once it has expired"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _dispatch(self):
+        """
+        Hand waiting jobs to the executor (called with the lock held)
+
+        Keeps each process busy with one task running and one ready to go.
+
+        Returns:
+            list of (jobs, error) for batches the executor refused; the caller
+            completes them once the lock is released
+        """
+        failed = []
+        while self._pending and self._executor is not None and len(self._futures) < self.workers * 2:
+            jobs = [self._pending.popitem(last=False)[1] for _ in range(min(self.batch_size, len(self._pending)))]
+            try:
+                future = self._executor.submit(_analyze, [(job.image, job.actions, job.detector_backend) for job in jobs])
+            except (BrokenProcessPool, RuntimeError) as e:
+                failed.append((jobs, e))
+                self._restart(e)
+                continue
+            self._futures.add(future)
+            future.add_done_callback(lambda future, jobs=jobs: self._finished(jobs, future))
+        return failed
+
+    def _finished(self, jobs, future):
+        results, error = None, None
+        try:
+            results = future.result()
+        except Exception as e:
+            error = e
+
+        with self._lock:
+            current = future in self._futures
+            self._futures.discard(future)
+            if isinstance(error, BrokenProcessPool) and current:
+                # A worker died; every other batch on this executor fails too
+                self._restart(error)
+            failed = self._dispatch()
+
+        self._complete(jobs, results, error)
+        for batch, batch_error in failed:
+            self._complete(batch, error=batch_error)
+
+    def _complete(self, jobs, results=None, error=None):
+        """Set each job's result (a failure result if the batch failed) and run its callback"""
+        if results is None:
+            print(f"Emotion batch of {len(jobs)} failed: {error}")
+            results = [{
+                'success': False,
+                'error': str(error),
+                'dominant_emotion': 'neutral',
+                'emotions': {},
+                'greeting_message': ''
+            }] * len(jobs)
+
+        for job, result in zip(jobs, results):
+            job.result = result
+            job.image = None
+            job._done.set()
+
+        for job, result in zip(jobs, results):
+            if job.callback:
+                try:
+                    job.callback(result)
+                except Exception as e:
+                    print(f"Error handling emotion result for job {job.id}: {e}")
+
+    def _prune(self):
+        # Forget finished jobs after result_ttl seconds; jobs still running are kept
+        cutoff = time.monotonic() - self.result_ttl
+        expired = []
+        for job_id, job in self._jobs.items():
+            if job.created_at >= cutoff:
+                break
+            if job.done:
+                expired.append(job_id)
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _collect_ready(self):
+        # Pool processes report (pid, ready) once their models are warm
+        while self._ready_queue is not None:
+            try:
+                pid, ready = self._ready_queue.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                break
+            if ready:
+                self._warm_pids.add(pid)
+
+    def health(self):
+        """Readiness report: ready once every process has warmed its models"""
+        with self._lock:
+            self._collect_ready()
+            return {
+                'ready': self._executor is not None and len(self._warm_pids) >= self.workers,
+                'workers': self.workers,
+                'warm_workers': len(self._warm_pids),
+                'pending': len(self._pending),
+                'in_flight': len(self._futures),
+                'dropped': self.dropped,
+                'restarts': self.restarts
+            }
+
+
+# Global emotion pool instance
+emotion_pool = EmotionPool()
@@ -0,0 +1,159 @@
+"""
+Streaming exports of tracking, visitor and emotion logs
+Rows are read with yield_per and serialized chunk by chunk (CSV or NDJSON,
+optionally gzipped), so memory stays flat regardless of table size
+"""
+
+import csv
+import io
+import json
+import zlib
+from models import db, User, EmotionTracking
+from models.student_tracking import StudentTracking
+from models.visitor_entry import VisitorEntry
+from utils.timezone import filter_ist_days, to_ist
+
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Rows serialized per yielded chunk
+CHUNK_ROWS = 500
+
+
+def _tracking_query():
+    return db.session.query(
+        StudentTracking.id,
+        StudentTracking.user_id,
+        User.full_name,
+        User.registration_id,
+        User.role,
+        StudentTracking.entry_type,
+        StudentTracking.timestamp,
+        StudentTracking.verification_method,
+        StudentTracking.location
+    ).join(User, User.id == StudentTracking.user_id), StudentTracking.timestamp, StudentTracking.id
+
+
+def _visitor_query():
+    # Explicit columns: the photo BLOB and face encoding are never loaded
+    return db.session.query(
+        VisitorEntry.id,
+        VisitorEntry.name,
+        VisitorEntry.reason,
+        VisitorEntry.phone,
+        VisitorEntry.organization,
+        VisitorEntry.host_name,
+        VisitorEntry.entry_time,
+        VisitorEntry.exit_time,
+        VisitorEntry.status,
+        VisitorEntry.is_returning_visitor,
+        VisitorEntry.previous_visit_count,
+        VisitorEntry.created_by_role
+    ), VisitorEntry.entry_time, VisitorEntry.id
+
+
+def _emotion_query():
+    return db.session.query(
+        EmotionTracking.id,
+        EmotionTracking.user_id,
+        User.full_name,
+        EmotionTracking.tracking_id,
+        EmotionTracking.dominant_emotion,
+        EmotionTracking.confidence,
+        EmotionTracking.age,
+        EmotionTracking.gender,
+        EmotionTracking.emotion_scores,
+        EmotionTracking.timestamp
+    ).join(User, User.id == EmotionTracking.user_id), EmotionTracking.timestamp, EmotionTracking.id
+
+
+# name -> query builder returning (query, timestamp column for ordering and date filters, id column)
+EXPORTS = {
+    'tracking': _tracking_query,
+    'visitors': _visitor_query,
+    'emotions': _emotion_query,
+}
+
+
+def _value(value):
+    """JSON/CSV friendly value (timestamps as ISO strings, still UTC)"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def iter_rows(kind, start_date=None, end_date=None, batch_size=1000):
+    """
+    Yield one dict per exported row, oldest first
+
+    Each row also carries an IST rendering of its timestamp column.
+
+    Args:
+        kind: 'tracking', 'visitors' or 'emotions'
+        start_date / end_date: optional IST day bounds (inclusive)
+    """
+    query, timestamp_column, id_column = EXPORTS[kind]()
+    query = filter_ist_days(query, timestamp_column, start_date, end_date)
+    query = query.order_by(timestamp_column, id_column)
+
+    for row in query.yield_per(batch_size):
+        record = {key: _value(value) for key, value in row._mapping.items()}
+        timestamp = row._mapping[timestamp_column.key]
+        record[f'{timestamp_column.key}_ist'] = to_ist(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp else None
+        yield record
+
+
+def columns(kind):
+    """Column names of an export, in output order"""
+    query, timestamp_column, _ = EXPORTS[kind]()
+    return [description['name'] for description in query.column_descriptions] + [f'{timestamp_column.key}_ist']
+
+
+def stream_csv(kind, rows):
+    """CSV text chunks: a header line, then CHUNK_ROWS rows per chunk"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns(kind))
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_ndjson(rows):
+    """Newline-delimited JSON chunks, CHUNK_ROWS rows per chunk"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row))
+        if len(lines) >= CHUNK_ROWS:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def gzip_stream(chunks):
+    """Gzip a stream of text chunks incrementally"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(kind, fmt='csv', start_date=None, end_date=None, compress=False):
+    """Chunk generator for one export in the requested format"""
+    rows = iter_rows(kind, start_date, end_date)
+    chunks = stream_csv(kind, rows) if fmt == 'csv' else stream_ndjson(rows)
+    if compress:
+        return gzip_stream(chunks)
+    return (chunk.encode('utf-8') for chunk in chunks)
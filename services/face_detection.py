@@ -0,0 +1,171 @@
+"""
+Configurable face detection tier
+Detects on a downscaled copy of the frame and maps boxes back to full resolution,
+with selectable HOG (dlib), Haar cascade or OpenCV DNN backends
+"""
+
+import os
+import threading
+import cv2
+
+
+BACKENDS = ('hog', 'haar', 'dnn')
+
+# OpenCV res10 SSD face detector files expected in FACE_DNN_MODEL_DIR
+DNN_PROTOTXT = 'deploy.prototxt'
+DNN_WEIGHTS = 'res10_300x300_ssd_iter_140000.caffemodel'
+
+
+def box_iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+def crop_box(image, box, margin=0.0):
+    """
+    Crop a (top, right, bottom, left) box out of an image
+
+    margin grows the box by that fraction of its size on every side (clipped
+    to the image), e.g. to keep the chin and forehead around a tight dlib box.
+    """
+    top, right, bottom, left = box
+    pad_y = int((bottom - top) * margin)
+    pad_x = int((right - left) * margin)
+    height, width = image.shape[:2]
+    return image[max(0, top - pad_y):min(height, bottom + pad_y),
+                 max(0, left - pad_x):min(width, right + pad_x)]
+
+
+class FaceDetector:
+    """
+    Face detector with a downscaled working resolution
+
+    Frames wider than working_width are resized (INTER_AREA) before detection;
+    the resulting boxes are scaled back so encodings are still computed on the
+    full-resolution image. working_width=0 detects at full resolution.
+    """
+
+    def __init__(self, backend='hog', working_width=480, dnn_model_dir='data/face_detector',
+                 dnn_confidence=0.6):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown face detector backend '{backend}', expected one of {BACKENDS}")
+        self.backend = backend
+        self.working_width = working_width
+        self.dnn_model_dir = dnn_model_dir
+        self.dnn_confidence = dnn_confidence
+        self._cascade = None
+        self._net = None
+        self._net_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a detector from a Flask config mapping"""
+        return cls(
+            backend=config.get('FACE_DETECTOR_BACKEND', 'hog'),
+            working_width=config.get('FACE_DETECTION_WIDTH', 480),
+            dnn_model_dir=config.get('FACE_DNN_MODEL_DIR', 'data/face_detector'),
+            dnn_confidence=config.get('FACE_DNN_CONFIDENCE', 0.6),
+        )
+
+    def detect(self, image):
+        """
+        Detect faces in a BGR image
+
+        Returns:
+            list: (top, right, bottom, left) boxes in full-resolution pixel coordinates
+        """
+        height, width = image.shape[:2]
+        scale = 1.0
+        small = image
+        if self.working_width and width > self.working_width:
+            scale = self.working_width / width
+            small = cv2.resize(image, (self.working_width, int(round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+
+        if self.backend == 'haar':
+            boxes = self._detect_haar(small)
+        elif self.backend == 'dnn':
+            boxes = self._detect_dnn(small)
+        else:
+            boxes = self._detect_hog(small)
+
+        if scale == 1.0:
+            return boxes
+
+        # Map boxes back to full resolution, clipped to the image
+        return [
+            (
+                max(0, int(round(top / scale))),
+                min(width, int(round(right / scale))),
+                min(height, int(round(bottom / scale))),
+                max(0, int(round(left / scale))),
+            )
+            for top, right, bottom, left in boxes
+        ]
+
+    def _detect_hog(self, image):
+        import face_recognition  # dlib, loaded on first detection
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        return face_recognition.face_locations(rgb)
+
+    def _detect_haar(self, image):
+        # Same cascade as AttentionMonitoringService._fallback_detection
+        if self._cascade is None:
+            self._cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        faces = self._cascade.detectMultiScale(gray, 1.1, 4)
+        return [(int(y), int(x + w), int(y + h), int(x)) for (x, y, w, h) in faces]
+
+    def _load_net(self):
+        prototxt = os.path.join(self.dnn_model_dir, DNN_PROTOTXT)
+        weights = os.path.join(self.dnn_model_dir, DNN_WEIGHTS)
+        if not (os.path.exists(prototxt) and os.path.exists(weights)):
+            raise FileNotFoundError(
+                f"DNN face detector needs {DNN_PROTOTXT} and {DNN_WEIGHTS} in {self.dnn_model_dir}"
+            )
+        return cv2.dnn.readNetFromCaffe(prototxt, weights)
+
+    def _detect_dnn(self, image):
+        height, width = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(cv2.resize(image, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
+        # cv2.dnn.Net is not safe to share between threads mid-forward
+        with self._net_lock:
+            if self._net is None:
+                self._net = self._load_net()
+            self._net.setInput(blob)
+            detections = self._net.forward()
+
+        boxes = []
+        for i in range(detections.shape[2]):
+            if detections[0, 0, i, 2] < self.dnn_confidence:
+                continue
+            x1, y1, x2, y2 = detections[0, 0, i, 3:7]
+            left, top = max(0, int(x1 * width)), max(0, int(y1 * height))
+            right, bottom = min(width, int(x2 * width)), min(height, int(y2 * height))
+            if right > left and bottom > top:
+                boxes.append((top, right, bottom, left))
+        return boxes
+
+
+_default_detector = None
+_default_lock = threading.Lock()
+
+
+def get_face_detector():
+    """Process-wide detector configured from the current app (HOG at 480 px without one)"""
+    global _default_detector
+    if _default_detector is None:
+        with _default_lock:
+            if _default_detector is None:
+                from flask import has_app_context, current_app
+                if has_app_context():
+                    _default_detector = FaceDetector.from_config(current_app.config)
+                else:
+                    _default_detector = FaceDetector()
+    return _default_detector
@@ -0,0 +1,75 @@
+"""
+Decode-once analyzed frame shared by the face recognition and visitor services
+Holds the decoded image, face boxes and encodings so each is computed at most once per request
+"""
+
+import cv2
+import numpy as np
+from services.face_detection import get_face_detector
+
+
+class AnalyzedFrame:
+    """
+    One camera frame with lazily computed detection results
+
+    The image is decoded on construction; RGB conversion, face locations and
+    face encodings are computed on first access and cached, so passing the
+    same frame through several checks costs a single detection and encoding.
+    """
+
+    def __init__(self, image_data=None, image=None):
+        if image is None:
+            nparr = np.frombuffer(image_data, np.uint8)
+            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        self.image_data = image_data
+        self.image = image  # BGR, None if the bytes could not be decoded
+        self._rgb = None
+        self._face_locations = None
+        self._encodings = None
+
+    @property
+    def is_valid(self):
+        return self.image is not None
+
+    @property
+    def rgb(self):
+        """RGB copy of the image (face_recognition expects RGB)"""
+        if self._rgb is None:
+            if self.image is None:
+                raise ValueError("Invalid image data")
+            self._rgb = cv2.cvtColor(self.image, cv2.COLOR_BGR2RGB)
+        return self._rgb
+
+    @property
+    def face_locations(self):
+        """Face boxes as (top, right, bottom, left) tuples in full-resolution coordinates"""
+        if self._face_locations is None:
+            if self.image is None:
+                raise ValueError("Invalid image data")
+            # Detection runs on a downscaled copy; encodings below use the full image
+            self._face_locations = get_face_detector().detect(self.image)
+        return self._face_locations
+
+    @property
+    def encodings(self):
+        """128-d encodings, one per detected face"""
+        if self._encodings is None:
+            if not self.face_locations:
+                self._encodings = []
+            else:
+                import face_recognition  # dlib, loaded on first encoding
+                self._encodings = face_recognition.face_encodings(self.rgb, self.face_locations)
+        return self._encodings
+
+    @property
+    def encoding(self):
+        """Encoding of the first detected face, or None"""
+        encodings = self.encodings
+        return encodings[0] if len(encodings) > 0 else None
+
+
+def analyze_frame(source):
+    """Wrap raw image bytes in an AnalyzedFrame; frames are passed through unchanged"""
+    if isinstance(source, AnalyzedFrame):
+        return source
+    return AnalyzedFrame(source)
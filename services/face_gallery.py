@@ -0,0 +1,174 @@
+"""
+In-memory face gallery for vectorized matching
+Keeps all enrolled encodings in one contiguous float32 matrix with a parallel id array
+"""
+
+import threading
+import numpy as np
+
+
+class FaceGallery:
+    """Contiguous N x 128 float32 gallery of face encodings keyed by id"""
+
+    def __init__(self, dim=128, initial_capacity=64):
+        self.dim = dim
+        self._matrix = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._sq_norms = np.zeros(initial_capacity, dtype=np.float32)
+        self._ids = np.zeros(initial_capacity, dtype=np.int64)
+        self._rows = {}  # id -> row index
+        self._size = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    @property
+    def matrix(self):
+        """Live N x dim view of the gallery matrix"""
+        return self._matrix[:self._size]
+
+    @property
+    def ids(self):
+        """Live view of the ids, parallel to the matrix rows"""
+        return self._ids[:self._size]
+
+    def keys(self):
+        """Return all ids in the gallery"""
+        with self._lock:
+            return [int(key) for key in self._ids[:self._size]]
+
+    def get(self, key):
+        """Return the encoding for an id, or None"""
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                return None
+            return self._matrix[row].copy()
+
+    def as_dict(self):
+        """Return a {id: encoding} snapshot of the gallery"""
+        with self._lock:
+            return {
+                int(key): self._matrix[row].copy()
+                for row, key in enumerate(self._ids[:self._size])
+            }
+
+    def _grow(self):
+        """Double the row capacity, keeping existing rows"""
+        capacity = max(1, len(self._matrix) * 2)
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        sq_norms = np.zeros(capacity, dtype=np.float32)
+        ids = np.zeros(capacity, dtype=np.int64)
+        matrix[:self._size] = self._matrix[:self._size]
+        sq_norms[:self._size] = self._sq_norms[:self._size]
+        ids[:self._size] = self._ids[:self._size]
+        self._matrix, self._sq_norms, self._ids = matrix, sq_norms, ids
+
+    def add(self, key, encoding):
+        """Insert or replace the encoding stored for an id"""
+        vector = np.asarray(encoding, dtype=np.float32).reshape(-1)
+        if vector.shape[0] != self.dim:
+            raise ValueError(f"Expected a {self.dim}-d encoding, got {vector.shape[0]}")
+
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                if self._size == len(self._matrix):
+                    self._grow()
+                row = self._size
+                self._size += 1
+                self._rows[key] = row
+                self._ids[row] = key
+            self._matrix[row] = vector
+            self._sq_norms[row] = np.dot(vector, vector)
+
+    def remove(self, key):
+        """Remove an id by moving the last row into its slot; returns True if removed"""
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                return False
+            last = self._size - 1
+            if row != last:
+                moved_key = int(self._ids[last])
+                self._matrix[row] = self._matrix[last]
+                self._sq_norms[row] = self._sq_norms[last]
+                self._ids[row] = moved_key
+                self._rows[moved_key] = row
+            self._size = last
+            return True
+
+    def clear(self):
+        """Drop every encoding from the gallery"""
+        with self._lock:
+            self._rows = {}
+            self._size = 0
+
+    def distances(self, encoding):
+        """
+        Euclidean distance from one encoding to every gallery row
+
+        Uses ||a - b||^2 = ||a||^2 - 2 a.b + ||b||^2 with cached row norms,
+        so the whole scan is a single matrix-vector product.
+        """
+        query = np.asarray(encoding, dtype=np.float32).reshape(-1)
+        with self._lock:
+            n = self._size
+            squared = self._sq_norms[:n] - 2.0 * (self._matrix[:n] @ query) + np.dot(query, query)
+        return np.sqrt(np.maximum(squared, 0.0))
+
+    def search(self, encoding, k=1, exact=True):
+        """
+        Find the k closest gallery entries (always exact for a flat gallery)
+
+        Returns:
+            list: [(id, distance), ...] sorted by distance
+        """
+        with self._lock:
+            if self._size == 0:
+                return []
+            distances = self.distances(encoding)
+            k = min(k, self._size)
+            rows = np.argpartition(distances, k - 1)[:k]
+            rows = rows[np.argsort(distances[rows])]
+            return [(int(self._ids[row]), float(distances[row])) for row in rows]
+
+    def best_match(self, encoding):
+        """
+        Find the closest gallery entry
+
+        Returns:
+            tuple: (id or None, distance)
+        """
+        with self._lock:
+            if self._size == 0:
+                return None, float('inf')
+            distances = self.distances(encoding)
+            row = int(np.argmin(distances))
+            return int(self._ids[row]), float(distances[row])
+
+    def best_matches(self, encodings):
+        """
+        Find the closest gallery entry for each of several encodings
+
+        All queries are scored in one matrix-matrix product.
+
+        Returns:
+            list: [(id or None, distance), ...] in query order
+        """
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            n = self._size
+            if n == 0:
+                return [(None, float('inf'))] * len(queries)
+            squared = (
+                self._sq_norms[:n][None, :]
+                - 2.0 * (queries @ self._matrix[:n].T)
+                + np.einsum('ij,ij->i', queries, queries)[:, None]
+            )
+            rows = np.argmin(squared, axis=1)
+            distances = np.sqrt(np.maximum(squared[np.arange(len(queries)), rows], 0.0))
+            return [(int(self._ids[row]), float(dist)) for row, dist in zip(rows, distances)]
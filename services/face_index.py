@@ -0,0 +1,359 @@
+"""
+Pluggable nearest-neighbour indexes for face galleries
+Exact brute force for small galleries, an IVF (k-means partitioned) index for large ones
+"""
+
+import os
+import time
+import threading
+import numpy as np
+from services.face_gallery import FaceGallery
+from services.shared_gallery import SharedFaceGallery
+
+
+def _kmeans(matrix, k, iterations=10, seed=0):
+    """Plain k-means over the rows of matrix; returns a k x dim float32 centroid array"""
+    rng = np.random.default_rng(seed)
+    centroids = matrix[rng.choice(len(matrix), size=k, replace=False)].astype(np.float32)
+    sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+
+    for _ in range(iterations):
+        squared = (
+            sq_norms[:, None]
+            - 2.0 * (matrix @ centroids.T)
+            + np.einsum('ij,ij->i', centroids, centroids)[None, :]
+        )
+        labels = np.argmin(squared, axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, matrix)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty partitions from random rows so every list stays usable
+        empty = np.nonzero(~filled)[0]
+        if len(empty):
+            centroids[empty] = matrix[rng.choice(len(matrix), size=len(empty), replace=False)]
+
+    return centroids
+
+
+class IVFFaceIndex:
+    """
+    Inverted-file index: encodings are partitioned by nearest k-means centroid
+    and a query only scans the nprobe closest partitions.
+    """
+
+    def __init__(self, dim=128, nlist=None, nprobe=8, iterations=10, seed=0):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.seed = seed
+        self._centroids = np.zeros((0, dim), dtype=np.float32)
+        self._lists = []
+        self._owner = {}  # id -> partition number
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._owner)
+
+    def __contains__(self, key):
+        return key in self._owner
+
+    def keys(self):
+        """Return all ids in the index"""
+        with self._lock:
+            return list(self._owner.keys())
+
+    def get(self, key):
+        """Return the encoding for an id, or None"""
+        with self._lock:
+            partition = self._owner.get(key)
+            if partition is None:
+                return None
+            return self._lists[partition].get(key)
+
+    def as_dict(self):
+        """Return a {id: encoding} snapshot of the index"""
+        with self._lock:
+            snapshot = {}
+            for gallery in self._lists:
+                snapshot.update(gallery.as_dict())
+            return snapshot
+
+    def train(self, matrix, ids):
+        """(Re)build centroids and partitions from an N x dim matrix and parallel ids"""
+        matrix = np.asarray(matrix, dtype=np.float32).reshape(-1, self.dim)
+        ids = np.asarray(ids, dtype=np.int64)
+        n = len(matrix)
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        nlist = max(1, min(nlist, n))
+
+        centroids = _kmeans(matrix, nlist, self.iterations, self.seed) if n else np.zeros((1, self.dim), np.float32)
+        labels = self._assign(centroids, matrix) if n else np.zeros(0, dtype=np.int64)
+
+        lists = []
+        owner = {}
+        for partition in range(len(centroids)):
+            members = np.nonzero(labels == partition)[0]
+            gallery = FaceGallery(self.dim, initial_capacity=max(16, len(members)))
+            for row in members:
+                gallery.add(int(ids[row]), matrix[row])
+                owner[int(ids[row])] = partition
+            lists.append(gallery)
+
+        with self._lock:
+            self._centroids, self._lists, self._owner = centroids, lists, owner
+
+    @staticmethod
+    def _assign(centroids, matrix):
+        """Nearest-centroid label for each row of matrix"""
+        squared = (
+            np.einsum('ij,ij->i', centroids, centroids)[None, :]
+            - 2.0 * (matrix @ centroids.T)
+        )
+        return np.argmin(squared, axis=1)
+
+    def add(self, key, encoding):
+        """Insert or replace an encoding, routing it to its nearest partition"""
+        vector = np.asarray(encoding, dtype=np.float32).reshape(-1)
+        with self._lock:
+            if not self._lists:
+                self.train(vector[None, :], [key])
+                return
+            self.remove(key)
+            partition = int(self._assign(self._centroids, vector[None, :])[0])
+            self._lists[partition].add(key, vector)
+            self._owner[key] = partition
+
+    def remove(self, key):
+        """Remove an id; returns True if it was present"""
+        with self._lock:
+            partition = self._owner.pop(key, None)
+            if partition is None:
+                return False
+            return self._lists[partition].remove(key)
+
+    def clear(self):
+        """Drop every encoding and the trained partitions"""
+        with self._lock:
+            self._centroids = np.zeros((0, self.dim), dtype=np.float32)
+            self._lists = []
+            self._owner = {}
+
+    def search(self, encoding, k=1, exact=False):
+        """
+        Find the k closest entries among the nprobe nearest partitions
+
+        Args:
+            exact: probe every partition (brute force), used to measure recall
+
+        Returns:
+            list: [(id, distance), ...] sorted by distance
+        """
+        query = np.asarray(encoding, dtype=np.float32).reshape(-1)
+        with self._lock:
+            if not self._owner:
+                return []
+            nprobe = len(self._lists) if exact else min(self.nprobe, len(self._lists))
+            centroid_distances = (
+                np.einsum('ij,ij->i', self._centroids, self._centroids)
+                - 2.0 * (self._centroids @ query)
+            )
+            probes = np.argsort(centroid_distances)[:nprobe]
+            candidates = []
+            for partition in probes:
+                candidates.extend(self._lists[partition].search(query, k))
+        candidates.sort(key=lambda item: item[1])
+        return candidates[:k]
+
+    def best_match(self, encoding):
+        """
+        Find the closest entry among the probed partitions
+
+        Returns:
+            tuple: (id or None, distance)
+        """
+        results = self.search(encoding, k=1)
+        if not results:
+            return None, float('inf')
+        return results[0]
+
+    def best_matches(self, encodings):
+        """Closest entry for each encoding (probes partitions per query)"""
+        return [self.best_match(encoding) for encoding in encodings]
+
+
+class FaceIndex:
+    """
+    Face index facade used by the recognition and visitor services.
+
+    Starts as an exact FaceGallery and switches to an IVF index once the gallery
+    reaches ann_threshold entries (backend='auto'). backend='brute' or 'ivf'
+    pins one implementation regardless of size.
+    """
+
+    BACKENDS = ('auto', 'brute', 'ivf')
+    shared = False
+
+    def __init__(self, backend='auto', ann_threshold=20000, nlist=None, nprobe=8, dim=128):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown face index backend '{backend}', expected one of {self.BACKENDS}")
+        self.backend = backend
+        self.ann_threshold = ann_threshold
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._index = self._new_ivf() if backend == 'ivf' else FaceGallery(dim)
+        self._trained_size = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """Build an empty index from a Flask config mapping"""
+        return cls(
+            backend=config.get('FACE_INDEX_BACKEND', 'auto'),
+            ann_threshold=config.get('FACE_INDEX_ANN_THRESHOLD', 20000),
+            nlist=config.get('FACE_INDEX_NLIST'),
+            nprobe=config.get('FACE_INDEX_NPROBE', 8),
+        )
+
+    def _new_ivf(self):
+        return IVFFaceIndex(self.dim, nlist=self.nlist, nprobe=self.nprobe)
+
+    @property
+    def kind(self):
+        """Name of the implementation currently serving queries"""
+        return 'ivf' if isinstance(self._index, IVFFaceIndex) else 'brute'
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def keys(self):
+        return self._index.keys()
+
+    def get(self, key):
+        return self._index.get(key)
+
+    def as_dict(self):
+        return self._index.as_dict()
+
+    def load(self, items):
+        """Bulk-load (id, encoding) pairs, training the IVF index in one pass if needed"""
+        items = list(items)
+        with self._lock:
+            if self.backend == 'ivf' or (self.backend == 'auto' and len(items) >= self.ann_threshold):
+                index = self._new_ivf()
+                if items:
+                    ids = [key for key, _ in items]
+                    matrix = np.stack([np.asarray(enc, dtype=np.float32).reshape(-1) for _, enc in items])
+                    index.train(matrix, ids)
+            else:
+                index = FaceGallery(self.dim, initial_capacity=max(64, len(items)))
+                for key, encoding in items:
+                    index.add(key, encoding)
+            self._index = index
+            self._trained_size = len(index)
+
+    def rebuild(self):
+        """Retrain partitions from the current contents (e.g. after heavy growth)"""
+        self.load(self._index.as_dict().items())
+
+    def add(self, key, encoding):
+        with self._lock:
+            self._index.add(key, encoding)
+            size = len(self._index)
+            if self.backend == 'auto' and self.kind == 'brute' and size >= self.ann_threshold:
+                print(f"Face index reached {size} entries, switching to IVF")
+                self.rebuild()
+            elif self.kind == 'ivf' and size > 2 * max(self._trained_size, self.ann_threshold // 2, 1):
+                # Partitions were trained on half the current data; retrain so lists stay balanced
+                print(f"Face index doubled to {size} entries, retraining IVF partitions")
+                self.rebuild()
+
+    def remove(self, key):
+        return self._index.remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._index = self._new_ivf() if self.backend == 'ivf' else FaceGallery(self.dim)
+
+    def search(self, encoding, k=1, exact=False):
+        return self._index.search(encoding, k, exact=exact)
+
+    def best_match(self, encoding):
+        return self._index.best_match(encoding)
+
+    def best_matches(self, encodings):
+        return self._index.best_matches(encodings)
+
+
+def create_face_index(config, name):
+    """
+    Build the gallery for one service from a Flask config mapping
+
+    With FACE_GALLERY_SHARED_DIR set, every worker maps the same
+    <dir>/<name>.gallery file; otherwise each process keeps its own FaceIndex.
+    """
+    shared_dir = config.get('FACE_GALLERY_SHARED_DIR')
+    if shared_dir:
+        return SharedFaceGallery(os.path.join(shared_dir, f'{name}.gallery'))
+    return FaceIndex.from_config(config)
+
+
+def measure_recall(index, queries, k=1, threshold=None):
+    """
+    Compare an index against exact brute force over the same contents
+
+    Args:
+        index: FaceIndex, IVFFaceIndex or FaceGallery
+        queries: iterable of query encodings
+        k: neighbours compared per query
+        threshold: match threshold (e.g. 0.5 users, 0.55 visitors); when given,
+            also reports how often the ANN accept/reject decision agrees with exact
+
+    Returns:
+        dict: recall_at_k, threshold_agreement, latency in ms per query for both paths
+    """
+    hits = 0
+    agreements = 0
+    total = 0
+    exact_time = 0.0
+    ann_time = 0.0
+
+    for query in queries:
+        start = time.perf_counter()
+        exact = index.search(query, k, exact=True)
+        exact_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        approx = index.search(query, k)
+        ann_time += time.perf_counter() - start
+
+        if not exact:
+            continue
+        total += 1
+        exact_ids = {key for key, _ in exact}
+        hits += len(exact_ids & {key for key, _ in approx}) / len(exact_ids)
+
+        if threshold is not None:
+            exact_id, exact_distance = exact[0]
+            approx_id, approx_distance = approx[0] if approx else (None, float('inf'))
+            exact_accept = exact_distance < threshold
+            approx_accept = approx_distance < threshold
+            if exact_accept == approx_accept and (not exact_accept or exact_id == approx_id):
+                agreements += 1
+
+    total = max(total, 1)
+    return {
+        'queries': total,
+        'k': k,
+        'recall_at_k': hits / total,
+        'threshold': threshold,
+        'threshold_agreement': agreements / total if threshold is not None else None,
+        'exact_ms': exact_time * 1000 / total,
+        'ann_ms': ann_time * 1000 / total,
+    }
@@ -3,47 +3,60 @@ Full face recognition service with automatic face matching
 Uses face_recognition library (dlib-based) for accurate recognition
 """
 
-import cv2
-import numpy as np
-import face_recognition
-import pickle
-from models import db, FaceData, Attendance, User, EmotionTracking
-from models.student_tracking import StudentTracking
+from models import db, FaceData, Attendance, User
 from services.emotion_detection import emotion_service
-from datetime import datetime, timedelta
+from services.emotion_cache import emotion_cache
+from services.emotion_pool import emotion_pool
+from services.face_index import FaceIndex, create_face_index
+from services.face_frame import analyze_frame
+from services.identity import identity_resolver, USER, MATCH_THRESHOLDS
+from services.tracking_writer import tracking_writer
+from utils.face_encoding import encode_encoding, decode_gallery
+from datetime import datetime
 
 
 class FaceRecognitionService:
     """Full face recognition service with automatic matching"""
     
     def __init__(self):
-        self.known_faces = {}
+        self.gallery = FaceIndex()
         self._faces_loaded = False
         print("Face recognition initialized with automatic matching")
         print("Using face_recognition library with dlib backend")
     
-    def load_known_faces(self):
-        """Load all enrolled face encodings from database"""
+    def load_known_faces(self, rebuild=False):
+        """
+        Load all enrolled face encodings from database
+        
+        With a shared gallery, an already published gallery file is mapped
+        instead of querying the database unless rebuild=True.
+        """
         try:
-            from flask import has_app_context
+            from flask import has_app_context, current_app
             if not has_app_context():
                 print("Warning: No app context available, faces will be loaded on first use")
                 return
             
-            face_data_records = FaceData.query.all()
-            loaded_count = 0
+            gallery = create_face_index(current_app.config, 'users')
+            if gallery.shared and not rebuild and len(gallery) > 0:
+                # Another worker already published the gallery; just map it
+                self.gallery = gallery
+                self._faces_loaded = True
+                print(f"Mapped {len(gallery)} face encodings (generation {gallery.generation})")
+                return
             
-            for record in face_data_records:
-                if record.face_encoding and record.face_encoding != b'opencv_placeholder':
-                    try:
-                        encoding = pickle.loads(record.face_encoding)
-                        self.known_faces[record.user_id] = encoding
-                        loaded_count += 1
-                    except Exception as e:
-                        print(f"Error loading face encoding for user {record.user_id}: {e}")
+            face_data_rows = db.session.query(FaceData.user_id, FaceData.face_encoding).filter(
+                FaceData.face_encoding != b'opencv_placeholder'
+            ).all()
+            user_ids, matrix = decode_gallery(face_data_rows)
+            encodings = list(zip(user_ids, matrix))
             
+            # Build the new index off to the side, then swap it in one step
+            gallery.load(encodings)
+            self.gallery = gallery
             self._faces_loaded = True
-            print(f"Loaded {loaded_count} face encodings from database")
+            identity_resolver.invalidate()
+            print(f"Loaded {len(encodings)} face encodings from database ({gallery.kind} index)")
         except Exception as e:
             print(f"Error loading known faces: {e}")
     
@@ -52,45 +65,56 @@ class FaceRecognitionService:
         if not self._faces_loaded:
             self.load_known_faces()
     
+    @property
+    def known_faces(self):
+        """Snapshot of enrolled encodings as {user_id: encoding}"""
+        return self.gallery.as_dict()
+    
+    def add_known_face(self, user_id, encoding):
+        """Add or replace a single user's encoding in the gallery"""
+        self._ensure_faces_loaded()
+        self.gallery.add(user_id, encoding)
+        identity_resolver.on_gallery_add(USER, user_id, encoding)
+    
+    def remove_known_face(self, user_id):
+        """Drop a user's encoding from the gallery (e.g. when the user is deleted)"""
+        self._ensure_faces_loaded()
+        identity_resolver.on_gallery_remove(USER, user_id)
+        return self.gallery.remove(user_id)
+    
     def enroll_face(self, image_data, user_id, image_path=None):
         """Enroll a face with full face encoding"""
         try:
-            # Convert image data to numpy array
-            nparr = np.frombuffer(image_data, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            # Convert BGR to RGB (face_recognition uses RGB)
-            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            from flask import current_app
+            encoding_format = current_app.config.get('FACE_ENCODING_FORMAT', 'float32')
             
-            # Detect faces
-            face_locations = face_recognition.face_locations(rgb_image)
+            # Decode and detect faces (accepts raw bytes or an AnalyzedFrame)
+            frame = analyze_frame(image_data)
             
-            if len(face_locations) == 0:
+            if len(frame.face_locations) == 0:
                 return False, "No face detected in the image"
             
-            if len(face_locations) > 1:
+            if len(frame.face_locations) > 1:
                 return False, "Multiple faces detected. Please ensure only one face is in the image"
             
             # Get face encoding (128-dimensional vector)
-            face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
+            face_encoding = frame.encoding
             
-            if len(face_encodings) == 0:
+            if face_encoding is None:
                 return False, "Could not generate face encoding"
             
-            face_encoding = face_encodings[0]
-            
             # Check if user already has face data
             existing_face_data = FaceData.query.filter_by(user_id=user_id).first()
             
             if existing_face_data:
                 # Update existing record
-                existing_face_data.face_encoding = pickle.dumps(face_encoding)
+                existing_face_data.face_encoding = encode_encoding(face_encoding, encoding_format)
                 existing_face_data.image_path = image_path
             else:
                 # Create new record
                 face_data = FaceData(
                     user_id=user_id,
-                    face_encoding=pickle.dumps(face_encoding),
+                    face_encoding=encode_encoding(face_encoding, encoding_format),
                     image_path=image_path
                 )
                 db.session.add(face_data)
@@ -98,7 +122,7 @@ class FaceRecognitionService:
             db.session.commit()
             
             # Update known faces cache
-            self.known_faces[user_id] = face_encoding
+            self.add_known_face(user_id, face_encoding)
             
             return True, "Face enrolled successfully! Automatic recognition enabled."
         
@@ -112,27 +136,18 @@ class FaceRecognitionService:
             # Ensure faces are loaded from database
             self._ensure_faces_loaded()
             
-            # Convert image data to numpy array
-            nparr = np.frombuffer(image_data, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            # Convert BGR to RGB
-            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            
-            # Detect faces
-            face_locations = face_recognition.face_locations(rgb_image)
+            # Decode, detect and encode once (accepts raw bytes or an AnalyzedFrame)
+            frame = analyze_frame(image_data)
+            image = frame.image
             
-            if len(face_locations) == 0:
+            if len(frame.face_locations) == 0:
                 return False, None, "No face detected", None
             
-            # Get face encodings
-            face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
+            face_encoding = frame.encoding
             
-            if len(face_encodings) == 0:
+            if face_encoding is None:
                 return False, None, "Could not encode face", None
             
-            face_encoding = face_encodings[0]
-            
             # If user_id provided (manual confirmation)
             if user_id:
                 user = User.query.get(user_id)
@@ -141,7 +156,7 @@ class FaceRecognitionService:
                 
                 if mark_attendance:
                     # Create tracking record with duplicate prevention
-                    success, entry_type, message = self._create_tracking_record(user_id)
+                    success, entry_type, message, _ = self._create_tracking_record(user_id)
                     if not success:
                         return True, user, message, None
                     
@@ -150,33 +165,19 @@ class FaceRecognitionService:
                 return True, user, f"Verified: {user.full_name}", None
             
             # Automatic face matching
-            if len(self.known_faces) == 0:
+            if len(self.gallery) == 0:
                 return False, None, "No enrolled faces found. Please enroll first or confirm manually.", None
             
-            # Compare with all known faces
-            best_match_user_id = None
-            best_match_distance = float('inf')
-            
-            print(f"\n=== Face Recognition Debug ===")
-            print(f"Total known faces: {len(self.known_faces)}")
-            
-            for known_user_id, known_encoding in self.known_faces.items():
-                # Calculate face distance (lower is better)
-                face_distance = face_recognition.face_distance([known_encoding], face_encoding)[0]
-                
-                user = User.query.get(known_user_id)
-                user_name = user.full_name if user else f"User {known_user_id}"
-                print(f"  Distance to {user_name}: {face_distance:.4f}")
-                
-                if face_distance < best_match_distance:
-                    best_match_distance = face_distance
-                    best_match_user_id = known_user_id
+            # Nearest registered user (vectorized brute force or IVF, depending on gallery size)
+            candidates = identity_resolver.resolve(face_encoding, kinds=(USER,), k=1)
+            best_match_user_id = candidates[0]['id']
+            best_match_distance = candidates[0]['distance']
             
             # Threshold for face matching (0.5 is stricter, 0.6 is standard)
-            FACE_MATCH_THRESHOLD = 0.5
+            FACE_MATCH_THRESHOLD = MATCH_THRESHOLDS[USER]
             
-            print(f"Best match: User {best_match_user_id}, Distance: {best_match_distance:.4f}, Threshold: {FACE_MATCH_THRESHOLD}")
-            print(f"=== End Debug ===\n")
+            print(f"Face match: {len(self.gallery)} known faces, best user {best_match_user_id}, "
+                  f"distance {best_match_distance:.4f}, threshold {FACE_MATCH_THRESHOLD}")
             
             if best_match_distance < FACE_MATCH_THRESHOLD:
                 # Face recognized!
@@ -190,31 +191,23 @@ class FaceRecognitionService:
                     emotion_result = None
                     try:
                         print("DEBUG: Starting emotion analysis...")
-                        # Use the original BGR image directly (DeepFace expects BGR)
-                        # 'image' variable is already available from line 117
-                        emotion_result = emotion_service.analyze_emotion(image)
+                        cached = emotion_cache.get(best_match_user_id)
+                        if cached:
+                            # Seen moments ago (gate, kiosk or chat): reuse, nothing new to store
+                            emotion_result = dict(cached, cached=True)
+                        elif emotion_pool.enabled:
+                            # Analyzed in a pool process and stored with the entry when ready
+                            emotion_result = self._queue_emotion(image, frame.face_locations[0], best_match_user_id, tracking_record)
+                        else:
+                            # Reuse the dlib box on the original BGR image (DeepFace expects BGR)
+                            emotion_result = emotion_service.analyze_face(image, frame.face_locations[0])
+                            emotion_cache.put(best_match_user_id, emotion_result)
                         print(f"DEBUG: Emotion analysis result: {emotion_result.get('success', False) if emotion_result else 'None'}")
                         
                         if emotion_result and emotion_result.get('success'):
-                            # Create emotion tracking record IF tracking record exists
-                            # tracking_record might be the NEW one or the OLD one (returned by _create_tracking_record in updated logic)
-                            # Update: _create_tracking_record returns None for record if duplicate?
-                            # Let's check _create_tracking_record implementation.
-                            # If it returns the duplicate record as 4th arg (which I should verify), we can link to it.
-                            # Even if tracking_record is None, we just don't save to DB but we return the display data
-                            
-                            if tracking_record:
-                                emotion_tracking = EmotionTracking(
-                                    user_id=best_match_user_id,
-                                    tracking_id=tracking_record.id,
-                                    dominant_emotion=emotion_result['dominant_emotion'],
-                                    confidence=emotion_result['confidence'],
-                                    age=emotion_result['age'],
-                                    gender=emotion_result['gender']
-                                )
-                                emotion_tracking.set_emotion_scores(emotion_result['emotions'])
-                                db.session.add(emotion_tracking)
-                                db.session.commit()
+                            # Stored with the new entry, or with the recent one on a duplicate sighting
+                            if tracking_record and not emotion_result.get('pending') and not emotion_result.get('cached'):
+                                tracking_writer.record_emotion(best_match_user_id, tracking_record, emotion_result)
                                 print(f"Emotion logged: {emotion_result['dominant_emotion']} ({emotion_result['confidence']:.2f})")
                         else:
                             print(f"DEBUG: Emotion analysis failed or returned success=False. Using fallback.")
@@ -259,46 +252,178 @@ class FaceRecognitionService:
             print(f"Face verification error: {str(e)}")
             return False, None, f"Error verifying face: {str(e)}", None
     
-    def _create_tracking_record(self, user_id):
-        """Create a student tracking record with duplicate prevention and automatic IN/OUT detection"""
+    def verify_faces(self, image_data, mark_attendance=True):
+        """
+        Verify every face in a frame (batch mode for groups at the gate)
+        
+        All faces are encoded once, matched against the gallery in a single
+        matrix operation, and their tracking rows are queued together for the
+        tracking writer's next grouped transaction.
+        
+        Returns:
+            tuple: (success, results, message) where results has one dict per face:
+                {'box', 'recognized', 'user', 'distance', 'confidence', 'success',
+                 'entry_type', 'message', 'emotion'}
+        """
         try:
-            # Get the last tracking record for this user
-            last_record = StudentTracking.query.filter_by(user_id=user_id).order_by(
-                StudentTracking.timestamp.desc()
-            ).first()
-            
-            # Check for duplicate within 5 minutes
-            if last_record:
-                time_diff = datetime.utcnow() - last_record.timestamp
-                if time_diff < timedelta(minutes=5):
-                    # Duplicate entry within 5 minutes
-                    return False, last_record.entry_type, f"Recent {last_record.entry_type} entry detected {int(time_diff.total_seconds() / 60)} minutes ago", last_record
-            
-            # Determine entry type (alternate between IN and OUT)
-            if last_record:
-                # Alternate: if last was IN, this is OUT; if last was OUT, this is IN
-                entry_type = 'OUT' if last_record.entry_type == 'IN' else 'IN'
-            else:
-                # First entry is always IN
-                entry_type = 'IN'
-            
-            # Create tracking record
-            tracking = StudentTracking(
-                user_id=user_id,
-                entry_type=entry_type,
-                verification_method='face',
-                location='Main Gate'
-            )
-            db.session.add(tracking)
-            db.session.commit()
+            self._ensure_faces_loaded()
             
-            action_message = "entered the campus" if entry_type == 'IN' else "exited the campus"
-            return True, entry_type, f"Successfully {action_message}", tracking
+            frame = analyze_frame(image_data)
+            image = frame.image
+            
+            if len(frame.face_locations) == 0:
+                return False, [], "No face detected"
+            
+            encodings = frame.encodings
+            if len(encodings) == 0:
+                return False, [], "Could not encode face"
+            
+            if len(self.gallery) == 0:
+                return False, [], "No enrolled faces found. Please enroll first or confirm manually."
+            
+            FACE_MATCH_THRESHOLD = MATCH_THRESHOLDS[USER]
+            matches = self.gallery.best_matches(encodings)
+            
+            # Each user is logged once even if matched by several boxes
+            matched_ids = []
+            for user_id, distance in matches:
+                if user_id is not None and distance < FACE_MATCH_THRESHOLD and user_id not in matched_ids:
+                    matched_ids.append(user_id)
+            users = {user.id: user for user in User.query.filter(User.id.in_(matched_ids)).all()} if matched_ids else {}
+            
+            results = []
+            for box, (user_id, distance) in zip(frame.face_locations, matches):
+                user = users.get(user_id) if distance < FACE_MATCH_THRESHOLD else None
+                results.append({
+                    'box': box,
+                    'recognized': user is not None,
+                    'user': user,
+                    'distance': distance,
+                    'confidence': (1 - distance) * 100,
+                    'success': user is not None,
+                    'entry_type': None,
+                    'message': f"Recognized: {user.full_name}" if user else "Face not recognized",
+                    'emotion': None
+                })
+            
+            recognized = [result for result in results if result['recognized']]
+            print(f"Batch face match: {len(results)} faces, {len(recognized)} recognized")
+            
+            if mark_attendance and recognized:
+                # Emotion per face crop (or the user's cached one), stored with each entry
+                emotion_source = self._pooled_emotion if emotion_pool.enabled else self._inline_emotion
+                self._log_recognized(image, recognized, emotion_source)
+            
+            if not recognized:
+                return False, results, "Face not recognized. Please confirm your identity manually."
+            
+            return True, results, f"{len(recognized)} of {len(results)} faces recognized"
+        
+        except Exception as e:
+            print(f"Batch face verification error: {str(e)}")
+            return False, [], f"Error verifying faces: {str(e)}"
+    
+    def _log_recognized(self, image, recognized, emotion_source):
+        """
+        Log one tracking entry per recognized user and fill in each face's result
+        
+        emotion_source(image, box, user_id, entry) returns the emotion shown for
+        the user's first face and takes care of storing it with the entry.
+        """
+        logged = {}
+        for result in recognized:
+            logged.setdefault(result['user'].id, result)
+        tracking = self._create_tracking_records(list(logged))
         
+        for user_id, result in logged.items():
+            result['emotion'] = emotion_source(image, result['box'], user_id, tracking[user_id][3])
+        
+        for result in recognized:
+            success, entry_type, message, _ = tracking[result['user'].id]
+            result['success'] = success
+            result['entry_type'] = entry_type
+            if success:
+                result['message'] = f"{entry_type}: {result['user'].full_name} - {message} (confidence: {result['confidence']:.1f}%)"
+            else:
+                result['message'] = message
+    
+    def _pooled_emotion(self, image, box, user_id, entry):
+        """Cached emotion, or a pending pool job stored with the entry when ready"""
+        return emotion_cache.get(user_id) or self._queue_emotion(image, box, user_id, entry)
+    
+    def _inline_emotion(self, image, box, user_id, entry):
+        """Cached emotion, or analyze the face crop now and store it with the entry"""
+        cached = emotion_cache.get(user_id)
+        if cached:
+            # Seen moments ago: reuse, nothing new to store
+            return cached
+        try:
+            emotion_result = emotion_service.analyze_face(image, box)
         except Exception as e:
-            print(f"Error creating tracking record: {str(e)}")
-            db.session.rollback()
-            return False, None, f"Error creating tracking record: {str(e)}", None
+            print(f"Error analyzing emotion for user {user_id}: {e}")
+            return None
+        if not (emotion_result and emotion_result.get('success')):
+            return None
+        emotion_cache.put(user_id, emotion_result)
+        if entry:
+            tracking_writer.record_emotion(user_id, entry, emotion_result)
+        return emotion_result
+    
+    def _queue_emotion(self, image, box, user_id, entry):
+        """
+        Hand a face to the emotion pool; the result is stored with the entry when ready
+        
+        Returns:
+            dict: pending emotion result carrying the job id, or None if the pool
+                queue was full and the job was dropped
+        """
+        def store(result):
+            emotion_cache.put(user_id, result)
+            if result.get('success') and entry:
+                tracking_writer.record_emotion(user_id, entry, result)
+        
+        job = emotion_pool.submit(image, box, key=('user', user_id), callback=store)
+        if job is None:
+            return None
+        return {
+            'success': True,
+            'pending': True,
+            'job_id': job.id,
+            'dominant_emotion': None,
+            'confidence': None,
+            'emotions': {},
+            'greeting_message': ''
+        }
+    
+    def _create_tracking_record(self, user_id):
+        """Create a student tracking record with duplicate prevention and automatic IN/OUT detection"""
+        return self._create_tracking_records([user_id])[user_id]
+    
+    def _create_tracking_records(self, user_ids, emotions=None):
+        """
+        Log tracking entries for several users
+        
+        IN/OUT and the 5-minute duplicate check are decided from the tracking
+        writer's in-memory last entries; the rows (and optional emotion rows)
+        are committed in batches by its background writer.
+        
+        Args:
+            user_ids: users to log
+            emotions: optional {user_id: emotion_result} stored as EmotionTracking
+                rows linked to the entries
+        
+        Returns:
+            dict: {user_id: (success, entry_type, message, TrackingEntry)}
+        """
+        emotions = emotions or {}
+        results = {}
+        for user_id in user_ids:
+            try:
+                results[user_id] = tracking_writer.record_entry(user_id, emotion=emotions.get(user_id))
+            except Exception as e:
+                print(f"Error creating tracking record: {str(e)}")
+                results[user_id] = (False, None, f"Error creating tracking record: {str(e)}", None)
+        return results
     
     def get_attendance_records(self, user_id, days=30):
         """Get attendance records for a user"""
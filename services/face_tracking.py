@@ -0,0 +1,147 @@
+"""
+Frame-to-frame face tracking for live camera streams
+Matches face boxes to the previous frame by IoU so a person standing in front of
+a kiosk is encoded, matched and emotion-analyzed once per track instead of every tick
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from services.face_detection import box_iou
+
+
+class Track:
+    """One face followed across frames, with the result cached for it"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, box, now):
+        self.id = next(self._ids)
+        self.box = box
+        self.last_seen = now
+        self.result = None
+        self.refreshed_at = None
+
+    def is_fresh(self, refresh_interval, now=None):
+        """True if the cached result can be reused"""
+        if self.result is None:
+            return False
+        now = time.monotonic() if now is None else now
+        return now - self.refreshed_at < refresh_interval
+
+    def update(self, result):
+        """Cache a freshly computed result for this track"""
+        self.result = result
+        self.refreshed_at = time.monotonic()
+
+
+class FaceTracker:
+    """
+    Per-camera tracking sessions
+
+    Each camera keeps the tracks seen in its last frame. New boxes are matched
+    greedily to those tracks by IoU; unmatched boxes start new tracks and tracks
+    with no box in the current frame (or not seen for max_gap seconds) are lost.
+    Sessions are kept per worker process. The camera id comes from the client,
+    so sessions idle for max_gap seconds are evicted and at most max_sessions
+    are kept, least recently seen dropped first.
+    """
+
+    def __init__(self, iou_threshold=0.3, refresh_interval=10.0, max_gap=5.0, max_sessions=256):
+        self.iou_threshold = iou_threshold
+        self.refresh_interval = refresh_interval
+        self.max_gap = max_gap
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # camera id -> tracks, least recently seen first
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a tracker from a Flask config mapping"""
+        return cls(
+            iou_threshold=config.get('FACE_TRACK_IOU_THRESHOLD', 0.3),
+            refresh_interval=config.get('FACE_TRACK_REFRESH_SECONDS', 10.0),
+            max_gap=config.get('FACE_TRACK_MAX_GAP_SECONDS', 5.0),
+            max_sessions=config.get('FACE_TRACK_MAX_SESSIONS', 256),
+        )
+
+    def observe(self, camera_id, boxes):
+        """
+        Match one frame's boxes to the camera's tracks
+
+        Returns:
+            list: a Track per box (same order); new tracks have result None
+        """
+        now = time.monotonic()
+        with self._lock:
+            live = [
+                track for track in self._sessions.get(camera_id, [])
+                if now - track.last_seen <= self.max_gap
+            ]
+
+            pairs = sorted(
+                ((box_iou(box, track.box), i, j) for i, box in enumerate(boxes) for j, track in enumerate(live)),
+                reverse=True
+            )
+            tracks = [None] * len(boxes)
+            for iou, i, j in pairs:
+                if iou < self.iou_threshold:
+                    break
+                if tracks[i] is not None or live[j] in tracks:
+                    continue
+                tracks[i] = live[j]
+
+            for i, box in enumerate(boxes):
+                if tracks[i] is None:
+                    tracks[i] = Track(box, now)
+                else:
+                    tracks[i].box = box
+                    tracks[i].last_seen = now
+
+            if tracks:
+                self._sessions[camera_id] = tracks
+                self._sessions.move_to_end(camera_id)
+            else:
+                self._sessions.pop(camera_id, None)
+            self._evict(now)
+            return list(tracks)
+
+    def _evict(self, now):
+        # Every track of a session is stamped when the session is updated, so
+        # the first session is the least recently seen one
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if len(self._sessions) <= self.max_sessions and now - oldest[0].last_seen <= self.max_gap:
+                break
+            self._sessions.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def reset(self, camera_id=None):
+        """Forget one camera's tracks, or every session"""
+        with self._lock:
+            if camera_id is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(camera_id, None)
+
+
+_default_tracker = None
+_default_lock = threading.Lock()
+
+
+def get_face_tracker():
+    """Process-wide tracker configured from the current app"""
+    global _default_tracker
+    if _default_tracker is None:
+        with _default_lock:
+            if _default_tracker is None:
+                from flask import has_app_context, current_app
+                if has_app_context():
+                    _default_tracker = FaceTracker.from_config(current_app.config)
+                else:
+                    _default_tracker = FaceTracker()
+    return _default_tracker
@@ -0,0 +1,218 @@
+"""
+Unified identity resolution against registered users and visitors
+Searches one combined, labeled gallery so a face is matched against both populations in one pass
+"""
+
+import threading
+from services.face_index import FaceIndex, create_face_index
+from services.face_frame import AnalyzedFrame, analyze_frame
+
+
+USER = 'user'
+VISITOR = 'visitor'
+KINDS = (USER, VISITOR)
+
+# Match thresholds per kind (visitor matching is slightly more lenient)
+MATCH_THRESHOLDS = {USER: 0.5, VISITOR: 0.55}
+
+# Combined keys pack the kind into the low bit: key = id * 2 + kind bit
+_KIND_BITS = {USER: 0, VISITOR: 1}
+
+
+def _pack(kind, identity_id):
+    return int(identity_id) * 2 + _KIND_BITS[kind]
+
+
+def _unpack(key):
+    return (VISITOR if key & 1 else USER), key >> 1
+
+
+class IdentityResolver:
+    """
+    Resolves a face to the nearest registered users and visitors
+
+    Keeps a combined gallery of every user and visitor encoding (kind packed
+    into the key) next to the per-service galleries, so searches over both
+    populations are a single vectorized scan. Single-kind searches go straight
+    to the owning service's gallery, which avoids scanning visitors at the gate.
+    """
+
+    def __init__(self):
+        self.gallery = FaceIndex()
+        self._loaded = False
+        self._needs_rebuild = False
+        self._lock = threading.Lock()
+
+    def _services(self):
+        from services.face_recognition import face_recognition_service
+        from services.visitor_service import visitor_service
+        return face_recognition_service, visitor_service
+
+    def load(self, rebuild=False):
+        """Build the combined gallery from the user and visitor galleries"""
+        try:
+            from flask import has_app_context, current_app
+            if not has_app_context():
+                print("Warning: No app context available for identity gallery")
+                return
+
+            face_service, visitor_service = self._services()
+            face_service._ensure_faces_loaded()
+            visitor_service._ensure_faces_loaded()
+
+            gallery = create_face_index(current_app.config, 'identities')
+            if gallery.shared and not rebuild and len(gallery) > 0:
+                # Another worker already published the combined gallery; just map it
+                self.gallery = gallery
+                self._loaded = True
+                return
+
+            # Shared galleries: if another worker enrolled someone while this
+            # one was reading, build again so the published copy includes them
+            for _ in range(3):
+                sources = self._source_generations()
+                items = [(_pack(USER, key), enc) for key, enc in face_service.gallery.as_dict().items()]
+                items += [(_pack(VISITOR, key), enc) for key, enc in visitor_service.gallery.as_dict().items()]
+                gallery.load(items)
+                if self._source_generations() == sources:
+                    break
+            self.gallery = gallery
+            self._loaded = True
+            self._needs_rebuild = False
+            print(f"Identity gallery: {len(items)} encodings ({gallery.kind} index)")
+        except Exception as e:
+            print(f"Error loading identity gallery: {e}")
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load(rebuild=self._needs_rebuild)
+
+    def invalidate(self):
+        """Rebuild the combined gallery on next use (after a service reloaded from the database)"""
+        self._loaded = False
+        self._needs_rebuild = True
+
+    def _source_generations(self):
+        # Generations of the shared user and visitor galleries (None when not shared)
+        face_service, visitor_service = self._services()
+        return (
+            getattr(face_service.gallery, 'generation', None),
+            getattr(visitor_service.gallery, 'generation', None),
+        )
+
+    def _write_target(self):
+        """
+        Combined gallery an enrollment must be written to, or None
+
+        In-process galleries are only updated once built (load() reads the
+        services' galleries). A shared combined gallery is written through even
+        when this worker has not mapped it yet, since other workers (and this
+        one, on first use) map the published file instead of rebuilding it.
+        """
+        if self._loaded:
+            return self.gallery
+        from flask import has_app_context, current_app
+        if not has_app_context():
+            return None
+        gallery = create_face_index(current_app.config, 'identities')
+        if gallery.shared and len(gallery) > 0:
+            return gallery
+        return None
+
+    def on_gallery_add(self, kind, identity_id, encoding):
+        """Keep the combined gallery in step with a service enrollment"""
+        gallery = self._write_target()
+        if gallery is not None:
+            gallery.add(_pack(kind, identity_id), encoding)
+
+    def on_gallery_remove(self, kind, identity_id):
+        """Keep the combined gallery in step with a service removal"""
+        gallery = self._write_target()
+        if gallery is not None:
+            gallery.remove(_pack(kind, identity_id))
+
+    def _encoding(self, image_or_encoding):
+        if isinstance(image_or_encoding, (bytes, bytearray, AnalyzedFrame)):
+            return analyze_frame(image_or_encoding).encoding
+        return image_or_encoding
+
+    def resolve(self, image_or_encoding, kinds=KINDS, k=3):
+        """
+        Find the closest identities for one face
+
+        Args:
+            image_or_encoding: raw image bytes, an AnalyzedFrame or a 128-d encoding
+            kinds: which populations to search ('user', 'visitor' or both)
+            k: number of candidates to return
+
+        Returns:
+            list of dicts sorted by distance: {
+                'kind': 'user' | 'visitor',
+                'id': int,
+                'distance': float,
+                'confidence': float (percent),
+                'matched': bool (distance below that kind's threshold)
+            }
+            An empty list if no face could be encoded or nothing is enrolled.
+        """
+        encoding = self._encoding(image_or_encoding)
+        if encoding is None:
+            return []
+
+        kinds = tuple(kinds)
+        face_service, visitor_service = self._services()
+
+        if kinds == (USER,):
+            face_service._ensure_faces_loaded()
+            results = [(USER, key, dist) for key, dist in face_service.gallery.search(encoding, k)]
+        elif kinds == (VISITOR,):
+            visitor_service._ensure_faces_loaded()
+            results = [(VISITOR, key, dist) for key, dist in visitor_service.gallery.search(encoding, k)]
+        else:
+            self._ensure_loaded()
+            results = [_unpack(key) + (dist,) for key, dist in self.gallery.search(encoding, k)]
+
+        return [
+            {
+                'kind': kind,
+                'id': identity_id,
+                'distance': distance,
+                'confidence': (1 - distance) * 100,
+                'matched': distance < MATCH_THRESHOLDS[kind],
+            }
+            for kind, identity_id, distance in results
+        ]
+
+    def best(self, image_or_encoding, kinds=KINDS, k=3):
+        """
+        Best matched candidate (within its kind's threshold), or None
+
+        A matched registered user always wins over a matched visitor, even a
+        closer one: a member with an old visitor entry is still a member. When
+        all k candidates are close enough that a user match could sit just
+        beyond them, the user gallery is checked on its own as well.
+        """
+        encoding = self._encoding(image_or_encoding)
+        if encoding is None:
+            return None
+
+        candidates = self.resolve(encoding, kinds=kinds, k=k)
+        matched_users = [c for c in candidates if c['kind'] == USER and c['matched']]
+        if not matched_users and USER in kinds and tuple(kinds) != (USER,) \
+                and len(candidates) == k and candidates[-1]['distance'] < MATCH_THRESHOLDS[USER]:
+            matched_users = [c for c in self.resolve(encoding, kinds=(USER,), k=1) if c['matched']]
+        if matched_users:
+            return matched_users[0]
+
+        # Look past the nearest hit: a slightly farther visitor can still pass
+        # the more lenient visitor threshold when the nearest user does not
+        for candidate in candidates:
+            if candidate['matched']:
+                return candidate
+        return None
+
+
+# Global identity resolver instance
+identity_resolver = IdentityResolver()
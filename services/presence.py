@@ -0,0 +1,154 @@
+"""
+In-memory campus presence state
+Holds every user's latest entry/exit so IN/OUT decisions and "is this person on
+campus" lookups are dictionary reads instead of tracking history scans
+"""
+
+import os
+import threading
+import time
+from utils.timezone import ist_date, ist_today
+
+
+class TrackingEntry:
+    """A logged entry/exit; id is filled in once the row has been written"""
+
+    __slots__ = ('user_id', 'entry_type', 'timestamp', 'location', 'verification_method', 'id')
+
+    def __init__(self, user_id, entry_type, timestamp, location='Main Gate', verification_method='face', id=None):
+        self.user_id = user_id
+        self.entry_type = entry_type
+        self.timestamp = timestamp
+        self.location = location
+        self.verification_method = verification_method
+        self.id = id
+
+
+class PresenceService:
+    """
+    Latest entry per user, warmed from the database and updated on every write
+
+    The table is per process. After init_app a daemon thread reloads it from
+    the database every refresh_interval seconds to pick up writes made by other
+    workers, keeping any newer entries this process logged but has not written
+    yet; lookups never wait on that reload. Without init_app the table is only
+    loaded once, on first use.
+    """
+
+    def __init__(self, refresh_interval=60):
+        self.refresh_interval = refresh_interval
+        self._entries = {}  # user_id -> TrackingEntry
+        self._loaded_at = None
+        self._lock = threading.RLock()
+        self._app = None
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._pid = None
+
+    def init_app(self, app):
+        """Bind to the app whose context the background reload uses"""
+        self._app = app
+        self.refresh_interval = app.config.get('PRESENCE_REFRESH_SECONDS', self.refresh_interval)
+
+    def load(self):
+        """Warm the table with each user's latest tracking row (one grouped query)"""
+        try:
+            from flask import has_app_context
+            if not has_app_context():
+                print("Warning: No app context available, presence will be loaded on first use")
+                return
+
+            from models import db
+            from models.student_tracking import StudentTracking
+
+            latest = db.session.query(
+                StudentTracking.user_id,
+                db.func.max(StudentTracking.timestamp).label('timestamp')
+            ).group_by(StudentTracking.user_id).subquery()
+            rows = db.session.query(StudentTracking).join(
+                latest,
+                db.and_(StudentTracking.user_id == latest.c.user_id,
+                        StudentTracking.timestamp == latest.c.timestamp)
+            ).order_by(StudentTracking.id).all()
+
+            with self._lock:
+                for record in rows:
+                    current = self._entries.get(record.user_id)
+                    if current is not None and current.timestamp > record.timestamp:
+                        # Logged here but not written yet
+                        continue
+                    self._entries[record.user_id] = TrackingEntry(
+                        record.user_id, record.entry_type, record.timestamp,
+                        record.location, record.verification_method, record.id)
+                self._loaded_at = time.monotonic()
+
+            print(f"Presence loaded: {len(rows)} users with tracking history")
+        except Exception as e:
+            print(f"Error loading presence state: {e}")
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None:
+            self.load()
+        if self._app is not None and self.refresh_interval:
+            self._ensure_thread()
+
+    def _ensure_thread(self):
+        # Threads do not survive fork: start one lazily in each worker process
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                    self._pid = os.getpid()
+                    self._thread = threading.Thread(target=self._run, name='presence-refresh', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            with self._app.app_context():
+                self.load()
+
+    def update(self, entry):
+        """Record a new entry/exit (called on every tracking write)"""
+        with self._lock:
+            self._entries[entry.user_id] = entry
+
+    def revert(self, entry):
+        """
+        Take back an entry whose row could not be written
+
+        The user's latest written row is restored from the database, unless a
+        newer entry has replaced this one in the meantime.
+        """
+        from models.student_tracking import StudentTracking
+        with self._lock:
+            if self._entries.get(entry.user_id) is not entry:
+                return
+            try:
+                record = StudentTracking.query.filter_by(user_id=entry.user_id).order_by(
+                    StudentTracking.timestamp.desc(), StudentTracking.id.desc()
+                ).first()
+            except Exception as e:
+                print(f"Error restoring presence for user {entry.user_id}: {e}")
+                record = None
+            if record is None:
+                self._entries.pop(entry.user_id, None)
+            else:
+                self._entries[entry.user_id] = TrackingEntry(
+                    record.user_id, record.entry_type, record.timestamp,
+                    record.location, record.verification_method, record.id)
+
+    def last_entry(self, user_id):
+        """Latest entry for a user, or None if they were never tracked"""
+        self._ensure_loaded()
+        return self._entries.get(user_id)
+
+    def today_entry(self, user_id):
+        """Latest entry for a user if it was logged today (IST), else None"""
+        entry = self.last_entry(user_id)
+        if entry is None or ist_date(entry.timestamp) != ist_today():
+            return None
+        return entry
+
+
+# Global presence instance
+presence_service = PresenceService()
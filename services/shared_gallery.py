@@ -0,0 +1,221 @@
+"""
+Memory-mapped face gallery shared by every worker process
+One file holds the ids, row norms and float32 encodings; writers publish a new
+generation atomically and readers remap only when the file changes
+"""
+
+import os
+import struct
+import tempfile
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, single worker only
+    fcntl = None
+
+
+MAGIC = b'FGAL'
+FORMAT_VERSION = 1
+# magic, format version, generation, count, dim (padded to 64 bytes)
+HEADER = struct.Struct('<4sIQQI')
+HEADER_SIZE = 64
+
+
+class SharedFaceGallery:
+    """
+    Face gallery backed by a memory-mapped file
+
+    File layout (little-endian): 64-byte header, int64 ids[count],
+    float32 squared norms[count], float32 encodings[count x dim].
+    Every write produces a complete new file that replaces the old one with
+    os.replace, so readers never see a partial gallery. Readers stat the file
+    on access and remap when it was replaced, picking up enrollments made by
+    other workers without querying the database.
+    """
+
+    shared = True
+    kind = 'shared'
+
+    def __init__(self, path, dim=128):
+        self.path = path
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._generation = 0
+        # (ids, squared norms, matrix, id -> row) of the mapped generation, swapped as one tuple
+        self._view = (
+            np.zeros(0, dtype='<i8'),
+            np.zeros(0, dtype='<f4'),
+            np.zeros((0, dim), dtype='<f4'),
+            {},
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    @contextmanager
+    def _file_lock(self):
+        """Serialize writers across processes"""
+        with open(self.path + '.lock', 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Remap the file if another process published a new generation; returns the current view"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return self._view
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return self._view
+
+        with self._lock:
+            if stamp == self._stamp:
+                return self._view
+            buffer = np.memmap(self.path, dtype=np.uint8, mode='r')
+            magic, version, generation, count, dim = HEADER.unpack(bytes(buffer[:HEADER.size]))
+            if magic != MAGIC or version != FORMAT_VERSION or dim != self.dim:
+                raise ValueError(f"Unsupported face gallery file: {self.path}")
+
+            offset = HEADER_SIZE
+            ids = np.frombuffer(buffer, dtype='<i8', count=count, offset=offset)
+            offset += ids.nbytes
+            sq_norms = np.frombuffer(buffer, dtype='<f4', count=count, offset=offset)
+            offset += sq_norms.nbytes
+            matrix = np.frombuffer(buffer, dtype='<f4', count=count * dim, offset=offset).reshape(count, dim)
+
+            self._view = (ids, sq_norms, matrix, {int(key): row for row, key in enumerate(ids)})
+            self._generation = generation
+            self._stamp = stamp
+            return self._view
+
+    @property
+    def generation(self):
+        """Generation number of the currently mapped gallery"""
+        self._refresh()
+        return self._generation
+
+    def _publish(self, ids, matrix):
+        """Write a complete gallery file and atomically swap it in (caller holds the file lock)"""
+        ids = np.ascontiguousarray(ids, dtype='<i8')
+        matrix = np.ascontiguousarray(matrix, dtype='<f4').reshape(-1, self.dim)
+        sq_norms = np.einsum('ij,ij->i', matrix, matrix).astype('<f4')
+
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, self._generation + 1, len(ids), self.dim)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(header.ljust(HEADER_SIZE, b'\0'))
+                temp_file.write(ids.tobytes())
+                temp_file.write(sq_norms.tobytes())
+                temp_file.write(matrix.tobytes())
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            os.replace(temp_path, self.path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._refresh()
+
+    def __len__(self):
+        return len(self._refresh()[0])
+
+    def __contains__(self, key):
+        return key in self._refresh()[3]
+
+    def keys(self):
+        return [int(key) for key in self._refresh()[0]]
+
+    def get(self, key):
+        _, _, matrix, rows = self._refresh()
+        row = rows.get(key)
+        return None if row is None else np.array(matrix[row])
+
+    def as_dict(self):
+        ids, _, matrix, _ = self._refresh()
+        return {int(key): np.array(matrix[row]) for row, key in enumerate(ids)}
+
+    def load(self, items):
+        """Publish a full gallery built from (id, encoding) pairs"""
+        items = list(items)
+        ids = np.array([key for key, _ in items], dtype='<i8')
+        if items:
+            matrix = np.stack([np.asarray(enc, dtype=np.float32).reshape(-1) for _, enc in items])
+        else:
+            matrix = np.zeros((0, self.dim), dtype='<f4')
+        with self._file_lock():
+            self._refresh()
+            self._publish(ids, matrix)
+
+    def add(self, key, encoding):
+        """Insert or replace an encoding and publish a new generation"""
+        vector = np.asarray(encoding, dtype=np.float32).reshape(1, -1)
+        with self._file_lock():
+            ids, _, matrix, rows = self._refresh()
+            row = rows.get(key)
+            if row is None:
+                ids = np.append(ids, key)
+                matrix = np.vstack([matrix, vector])
+            else:
+                matrix = np.array(matrix)
+                matrix[row] = vector
+            self._publish(ids, matrix)
+
+    def remove(self, key):
+        """Remove an id and publish a new generation; returns True if it was present"""
+        with self._file_lock():
+            ids, _, matrix, rows = self._refresh()
+            row = rows.get(key)
+            if row is None:
+                return False
+            keep = np.ones(len(ids), dtype=bool)
+            keep[row] = False
+            self._publish(ids[keep], matrix[keep])
+            return True
+
+    def clear(self):
+        """Publish an empty gallery"""
+        self.load([])
+
+    def search(self, encoding, k=1, exact=True):
+        """Exact k nearest neighbours over the mapped gallery"""
+        ids, sq_norms, matrix, _ = self._refresh()
+        if len(ids) == 0:
+            return []
+        query = np.asarray(encoding, dtype=np.float32).reshape(-1)
+        squared = sq_norms - 2.0 * (matrix @ query) + np.dot(query, query)
+        distances = np.sqrt(np.maximum(squared, 0.0))
+        k = min(k, len(ids))
+        rows = np.argpartition(distances, k - 1)[:k]
+        rows = rows[np.argsort(distances[rows])]
+        return [(int(ids[row]), float(distances[row])) for row in rows]
+
+    def best_match(self, encoding):
+        results = self.search(encoding, k=1)
+        if not results:
+            return None, float('inf')
+        return results[0]
+
+    def best_matches(self, encodings):
+        """Closest entry for each encoding, scored in one matrix-matrix product"""
+        ids, sq_norms, matrix, _ = self._refresh()
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if len(ids) == 0:
+            return [(None, float('inf'))] * len(queries)
+        squared = (
+            sq_norms[None, :]
+            - 2.0 * (queries @ matrix.T)
+            + np.einsum('ij,ij->i', queries, queries)[:, None]
+        )
+        rows = np.argmin(squared, axis=1)
+        distances = np.sqrt(np.maximum(squared[np.arange(len(queries)), rows], 0.0))
+        return [(int(ids[row]), float(dist)) for row, dist in zip(rows, distances)]
@@ -0,0 +1,273 @@
+"""
+Write-behind persistence for gate tracking
+Decides IN/OUT from in-memory last-entry state and hands StudentTracking and
+EmotionTracking inserts to a background writer that commits them in batches
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import has_app_context
+from services.emotion_cache import emotion_cache
+from services.presence import TrackingEntry, presence_service
+
+
+# Minimum gap between two logged entries for the same user
+DUPLICATE_WINDOW = timedelta(minutes=5)
+
+
+class TrackingWriter:
+    """
+    Tracking writes with a write-behind queue
+
+    The last entry per user comes from the in-memory presence table, so the
+    5-minute duplicate check and the IN/OUT decision need no query. With
+    several workers, an entry another worker logged since the table's last
+    background reload is not visible here (the default is one worker). Rows
+    are queued and a daemon thread commits them in grouped transactions (up
+    to batch_size rows, or whatever arrived within flush_interval seconds). When the queue
+    is full the row is written synchronously instead of blocking.
+
+    With write_behind disabled (or before init_app) rows are written
+    synchronously in the caller's app context.
+    """
+
+    def __init__(self, batch_size=100, flush_interval=0.2, max_queue=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.write_behind = True
+        self._app = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._pid = None
+
+    def init_app(self, app):
+        """Bind to the app whose context the background writer uses"""
+        self._app = app
+        self.write_behind = app.config.get('TRACKING_WRITE_BEHIND', True)
+        self.batch_size = app.config.get('TRACKING_WRITER_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('TRACKING_WRITER_FLUSH_INTERVAL', self.flush_interval)
+        atexit.register(self.flush)
+
+    def record_entry(self, user_id, emotion=None, location='Main Gate', verification_method='face'):
+        """
+        Log an entry/exit with duplicate prevention and automatic IN/OUT detection
+
+        Args:
+            emotion: optional emotion analysis result stored with the entry (or with
+                the recent entry when this sighting is a duplicate), subject to the
+                per-user emotion sampling interval
+
+        Returns:
+            tuple: (success, entry_type, message, TrackingEntry)
+        """
+        now = datetime.utcnow()
+        with self._lock:
+            last_entry = presence_service.last_entry(user_id)
+
+            # Check for duplicate within 5 minutes
+            if last_entry:
+                time_diff = now - last_entry.timestamp
+                if time_diff < DUPLICATE_WINDOW:
+                    if emotion and emotion_cache.should_store(user_id):
+                        self._submit(('emotion', user_id, last_entry, emotion, now))
+                    return False, last_entry.entry_type, f"Recent {last_entry.entry_type} entry detected {int(time_diff.total_seconds() / 60)} minutes ago", last_entry
+
+            # Alternate: if last was IN, this is OUT; first entry is always IN
+            entry_type = 'OUT' if last_entry and last_entry.entry_type == 'IN' else 'IN'
+            entry = TrackingEntry(user_id, entry_type, now, location, verification_method)
+            presence_service.update(entry)
+
+        # Queued (or written) outside the lock so a synchronous write never
+        # holds up other recognitions
+        if not self._submit(('tracking', entry)):
+            return False, None, "Error creating tracking record: the entry could not be saved", None
+        if emotion and emotion_cache.should_store(user_id):
+            self._submit(('emotion', user_id, entry, emotion, now))
+
+        action_message = "entered the campus" if entry_type == 'IN' else "exited the campus"
+        return True, entry_type, f"Successfully {action_message}", entry
+
+    def record_emotion(self, user_id, entry, emotion):
+        """
+        Store an emotion result linked to a (possibly still queued) entry
+
+        At most one sample per user is stored per emotion sampling interval.
+        """
+        if emotion_cache.should_store(user_id):
+            self._submit(('emotion', user_id, entry, emotion, datetime.utcnow()))
+
+    def _submit(self, item):
+        """Queue an item for the writer thread, or write it now; False if a tracking row was not written"""
+        if not self.write_behind or self._app is None:
+            return self._write_now([item])
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            print(f"Tracking write queue full ({self._queue.maxsize} items), writing synchronously")
+            return self._write_now([item])
+
+    def _write_now(self, items):
+        if self._app is not None and not has_app_context():
+            # e.g. an emotion result delivered on a pool thread
+            with self._app.app_context():
+                return not self._write_batch(items)
+        return not self._write_batch(items)
+
+    def _ensure_thread(self):
+        # Threads do not survive fork: start one lazily in each worker process
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                    self._pid = os.getpid()
+                    self._thread = threading.Thread(target=self._run, name='tracking-writer', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with self._app.app_context():
+                    self._write_batch(batch)
+            except Exception as e:
+                print(f"Error writing {len(batch)} queued tracking items: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, items):
+        """
+        Write queued items: tracking rows with their daily rollup, then emotion rows
+
+        Tracking rows commit in their own transaction. If it fails each row is
+        retried on its own, and rows that still fail are taken back out of the
+        presence table so memory keeps matching the database. Emotion rows
+        commit in a second transaction; a malformed sample is skipped and never
+        costs the tracking rows.
+
+        Returns:
+            list: tracking entries that could not be written
+        """
+        entries = [item[1] for item in items if item[0] == 'tracking']
+        failed = []
+        if entries and not self._write_tracking(entries):
+            if len(entries) > 1:
+                failed = [entry for entry in entries if not self._write_tracking([entry])]
+            else:
+                failed = entries
+            for entry in failed:
+                print(f"Dropped {entry.entry_type} entry for user {entry.user_id} at {entry.timestamp}")
+                presence_service.revert(entry)
+
+        emotions = [item for item in items if item[0] == 'emotion']
+        if emotions:
+            self._write_emotions(emotions)
+        return failed
+
+    def _write_tracking(self, entries):
+        """Insert tracking rows and fold them into daily_presence in one transaction"""
+        from models import db
+        from models.student_tracking import StudentTracking
+        from services.daily_presence import update_daily_presence
+        try:
+            records = [
+                StudentTracking(
+                    user_id=entry.user_id,
+                    entry_type=entry.entry_type,
+                    timestamp=entry.timestamp,
+                    verification_method=entry.verification_method,
+                    location=entry.location
+                )
+                for entry in entries
+            ]
+            db.session.add_all(records)
+
+            # Assign ids so emotion rows (and later duplicates) can reference them
+            db.session.flush()
+            ids = [record.id for record in records]
+
+            # Keep the daily_presence rollup in the same transaction, in a
+            # savepoint so a rollup failure never costs the tracking rows
+            try:
+                with db.session.begin_nested():
+                    update_daily_presence(entries)
+            except Exception as e:
+                print(f"Error updating daily_presence (run scripts/rebuild_daily_presence.py): {str(e)}")
+
+            db.session.commit()
+        except Exception as e:
+            print(f"Error writing {len(entries)} tracking rows: {str(e)}")
+            db.session.rollback()
+            return False
+
+        for entry, record_id in zip(entries, ids):
+            entry.id = record_id
+        return True
+
+    def _write_emotions(self, items):
+        """Insert emotion rows and fold them into daily_emotion in one transaction"""
+        from models import db, EmotionTracking
+        from services.daily_emotion import update_daily_emotion
+        samples = []
+        for _, user_id, entry, emotion, timestamp in items:
+            try:
+                emotion_tracking = EmotionTracking(
+                    user_id=user_id,
+                    tracking_id=entry.id if entry else None,
+                    dominant_emotion=emotion['dominant_emotion'],
+                    confidence=emotion['confidence'],
+                    age=emotion.get('age'),
+                    gender=emotion.get('gender'),
+                    timestamp=timestamp
+                )
+                emotion_tracking.set_emotion_scores(emotion['emotions'])
+            except Exception as e:
+                print(f"Skipping malformed emotion sample for user {user_id}: {str(e)}")
+                continue
+            samples.append(emotion_tracking)
+
+        if not samples:
+            return
+        try:
+            db.session.add_all(samples)
+
+            # Keep the daily_emotion rollup in the same transaction, in a
+            # savepoint so a rollup failure never costs the emotion rows
+            try:
+                with db.session.begin_nested():
+                    update_daily_emotion(samples)
+            except Exception as e:
+                print(f"Error updating daily_emotion (run scripts/rebuild_daily_emotion.py): {str(e)}")
+
+            db.session.commit()
+        except Exception as e:
+            print(f"Error writing {len(samples)} emotion rows: {str(e)}")
+            db.session.rollback()
+
+    def flush(self, timeout=5.0):
+        """Wait (up to timeout seconds) for queued rows to be written"""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+# Global tracking writer instance
+tracking_writer = TrackingWriter()
@@ -3,12 +3,12 @@ Visitor management service with facial recognition
 Handles visitor check-in/out and returning visitor detection
 """
 
-import cv2
-import numpy as np
-import face_recognition
-import pickle
 from models import db
 from models.visitor_entry import VisitorEntry
+from services.face_index import FaceIndex, create_face_index
+from services.face_frame import analyze_frame
+from services.identity import identity_resolver, USER, VISITOR
+from utils.face_encoding import encode_encoding, decode_gallery
 from datetime import datetime, timedelta
 
 
@@ -16,39 +16,45 @@ class VisitorService:
     """Service for managing visitor entries with facial recognition"""
     
     def __init__(self):
-        self.known_visitor_faces = {}
+        self.gallery = FaceIndex()
         self._faces_loaded = False
         print("Visitor service initialized")
     
-    def load_visitor_faces(self):
-        """Load all visitor face encodings from database"""
+    def load_visitor_faces(self, rebuild=False):
+        """
+        Load all visitor face encodings from database
+        
+        With a shared gallery, an already published gallery file is mapped
+        instead of querying the database unless rebuild=True.
+        """
         try:
-            from flask import has_app_context
+            from flask import has_app_context, current_app
             if not has_app_context():
                 print("Warning: No app context available for visitor faces")
                 return
             
-            # Load all visitors who have face encodings
-            visitors = VisitorEntry.query.filter(
+            gallery = create_face_index(current_app.config, 'visitors')
+            if gallery.shared and not rebuild and len(gallery) > 0:
+                # Another worker already published the gallery; just map it
+                self.gallery = gallery
+                self._faces_loaded = True
+                print(f"Mapped {len(gallery)} visitor face encodings (generation {gallery.generation})")
+                return
+            
+            # Load all visitors who have face encodings (skip the photo BLOB)
+            visitors = db.session.query(VisitorEntry.id, VisitorEntry.face_encoding).filter(
                 VisitorEntry.face_encoding.isnot(None)
             ).all()
             
-            loaded_count = 0
-            for visitor in visitors:
-                try:
-                    encoding = pickle.loads(visitor.face_encoding)
-                    # Use visitor ID as key
-                    self.known_visitor_faces[visitor.id] = {
-                        'encoding': encoding,
-                        'name': visitor.name,
-                        'visit_count': visitor.previous_visit_count
-                    }
-                    loaded_count += 1
-                except Exception as e:
-                    print(f"Error loading face encoding for visitor {visitor.id}: {e}")
+            # Use visitor ID as key
+            visitor_ids, matrix = decode_gallery(visitors)
+            encodings = list(zip(visitor_ids, matrix))
             
+            gallery.load(encodings)
+            self.gallery = gallery
             self._faces_loaded = True
-            print(f"Loaded {loaded_count} visitor face encodings")
+            identity_resolver.invalidate()
+            print(f"Loaded {len(encodings)} visitor face encodings ({gallery.kind} index)")
         except Exception as e:
             print(f"Error loading visitor faces: {e}")
     
@@ -57,61 +63,42 @@ class VisitorService:
         if not self._faces_loaded:
             self.load_visitor_faces()
     
+    @property
+    def known_visitor_faces(self):
+        """Snapshot of visitor encodings as {visitor_id: encoding}"""
+        return self.gallery.as_dict()
+    
     def check_returning_visitor(self, image_data):
         """
         Check if visitor has visited before using face recognition
+        image_data may be raw image bytes or an AnalyzedFrame
         Returns: (is_returning, visitor_data, confidence)
         """
         try:
             self._ensure_faces_loaded()
             
-            # Convert image data to numpy array
-            nparr = np.frombuffer(image_data, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            # Decode, detect and encode once; cached on the frame for later checks
+            frame = analyze_frame(image_data)
             
-            # Convert BGR to RGB
-            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            
-            # Detect faces
-            face_locations = face_recognition.face_locations(rgb_image)
-            
-            if len(face_locations) == 0:
+            if len(frame.face_locations) == 0:
                 return False, None, 0.0, "No face detected"
             
-            # Get face encoding
-            face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
-            
-            if len(face_encodings) == 0:
+            if frame.encoding is None:
                 return False, None, 0.0, "Could not encode face"
             
-            face_encoding = face_encodings[0]
-            
             # If no known visitors, this is a new visitor
-            if len(self.known_visitor_faces) == 0:
+            if len(self.gallery) == 0:
                 return False, None, 0.0, "No previous visitors in database"
             
-            # Compare with all known visitor faces
-            best_match_id = None
-            best_match_distance = float('inf')
+            # Nearest known visitor face
+            candidate = identity_resolver.resolve(frame, kinds=(VISITOR,), k=1)[0]
             
-            for visitor_id, visitor_data in self.known_visitor_faces.items():
-                known_encoding = visitor_data['encoding']
-                distance = face_recognition.face_distance([known_encoding], face_encoding)[0]
-                
-                if distance < best_match_distance:
-                    best_match_distance = distance
-                    best_match_id = visitor_id
-            
-            # Threshold for visitor matching (slightly more lenient than user matching)
-            VISITOR_MATCH_THRESHOLD = 0.55
-            
-            if best_match_distance < VISITOR_MATCH_THRESHOLD:
+            if candidate['matched']:
                 # Returning visitor found!
-                visitor = VisitorEntry.query.get(best_match_id)
-                confidence = (1 - best_match_distance) * 100
-                return True, visitor, confidence, "Returning visitor recognized"
+                visitor = VisitorEntry.query.get(candidate['id'])
+                return True, visitor, candidate['confidence'], "Returning visitor recognized"
             else:
-                return False, None, 0.0, f"No match found (best distance: {best_match_distance:.2f})"
+                return False, None, 0.0, f"No match found (best distance: {candidate['distance']:.2f})"
         
         except Exception as e:
             print(f"Error checking returning visitor: {e}")
@@ -120,59 +107,30 @@ class VisitorService:
     def check_if_student_or_faculty(self, image_data):
         """
         Check if the person in the image is a registered student or faculty member
+        image_data may be raw image bytes or an AnalyzedFrame
         Returns: (is_member, user_data, confidence, message)
         """
         try:
-            # Import face recognition service
-            from services.face_recognition import face_recognition_service
-            
-            # Convert image data to numpy array
-            nparr = np.frombuffer(image_data, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            # Decode, detect and encode once; cached on the frame for later checks
+            frame = analyze_frame(image_data)
             
-            # Convert BGR to RGB
-            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            
-            # Detect faces
-            face_locations = face_recognition.face_locations(rgb_image)
-            
-            if len(face_locations) == 0:
+            if len(frame.face_locations) == 0:
                 return False, None, 0.0, "No face detected"
             
-            # Get face encoding
-            face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
-            
-            if len(face_encodings) == 0:
+            if frame.encoding is None:
                 return False, None, 0.0, "Could not encode face"
             
-            face_encoding = face_encodings[0]
-            
             # Check against known student/faculty faces
-            if len(face_recognition_service.known_faces) == 0:
+            candidates = identity_resolver.resolve(frame, kinds=(USER,), k=1)
+            if not candidates:
                 return False, None, 0.0, "No registered users in database"
             
-            # Compare with all known faces
-            best_match_user_id = None
-            best_match_distance = float('inf')
-            
-            for user_id, user_data in face_recognition_service.known_faces.items():
-                known_encoding = user_data['encoding']
-                distance = face_recognition.face_distance([known_encoding], face_encoding)[0]
-                
-                if distance < best_match_distance:
-                    best_match_distance = distance
-                    best_match_user_id = user_id
-            
-            # Use same threshold as face recognition service
-            FACE_MATCH_THRESHOLD = 0.5
-            
-            if best_match_distance < FACE_MATCH_THRESHOLD:
+            if candidates[0]['matched']:
                 # This person is a registered student/faculty!
                 from models import User
-                user = User.query.get(best_match_user_id)
+                user = User.query.get(candidates[0]['id'])
                 if user:
-                    confidence = (1 - best_match_distance) * 100
-                    return True, user, confidence, f"Recognized as {user.role}: {user.full_name}"
+                    return True, user, candidates[0]['confidence'], f"Recognized as {user.role}: {user.full_name}"
             
             return False, None, 0.0, "Not a registered student/faculty member"
         
@@ -188,29 +146,41 @@ class VisitorService:
         Returns: (success, visitor_entry, message)
         """
         try:
-            # CRITICAL: First check if this person is a registered student/faculty member
-            is_member, user, confidence, check_message = self.check_if_student_or_faculty(image_data)
+            # Decode and analyze the photo once; all checks below share the result
+            frame = analyze_frame(image_data)
             
-            if is_member and user:
-                # Deny entry - this is a registered student/faculty member!
-                return False, None, f"Access Denied: You are registered as {user.role} ({user.full_name}). Please use the student/faculty entry system, not the visitor kiosk."
+            # One pass over users and visitors together
+            self._ensure_faces_loaded()
+            match = None
+            try:
+                match = identity_resolver.best(frame)
+            except Exception as e:
+                print(f"Warning: Could not resolve identity: {e}")
+            
+            # CRITICAL: Deny entry if this person is a registered student/faculty member
+            if match and match['kind'] == USER:
+                from models import User
+                user = User.query.get(match['id'])
+                if user:
+                    return False, None, f"Access Denied: You are registered as {user.role} ({user.full_name}). Please use the student/faculty entry system, not the visitor kiosk."
             
             # Not a student/faculty member, proceed with visitor check-in
             # Check if this is a returning visitor
-            is_returning, previous_visitor, confidence, check_message = self.check_returning_visitor(image_data)
+            previous_visitor = None
+            if match and match['kind'] == VISITOR:
+                previous_visitor = VisitorEntry.query.get(match['id'])
+            is_returning = previous_visitor is not None
             
             # Enroll face
             face_encoding = None
+            face_vector = None
             try:
-                nparr = np.frombuffer(image_data, np.uint8)
-                image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                
-                face_locations = face_recognition.face_locations(rgb_image)
-                if len(face_locations) > 0:
-                    face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
-                    if len(face_encodings) > 0:
-                        face_encoding = pickle.dumps(face_encodings[0])
+                if frame.encoding is not None:
+                    from flask import current_app
+                    face_vector = frame.encoding
+                    face_encoding = encode_encoding(
+                        face_vector, current_app.config.get('FACE_ENCODING_FORMAT', 'float32')
+                    )
             except Exception as e:
                 print(f"Warning: Could not enroll face: {e}")
             
@@ -238,12 +208,9 @@ class VisitorService:
             db.session.commit()
             
             # Update known faces cache
-            if face_encoding:
-                self.known_visitor_faces[visitor_entry.id] = {
-                    'encoding': pickle.loads(face_encoding),
-                    'name': name,
-                    'visit_count': previous_visit_count
-                }
+            if face_vector is not None:
+                self.gallery.add(visitor_entry.id, face_vector)
+                identity_resolver.on_gallery_add(VISITOR, visitor_entry.id, face_vector)
             
             if is_returning:
                 message = f"Welcome back, {name}! This is visit #{previous_visit_count + 1}"
@@ -1,7 +1,4 @@
-import speech_recognition as sr
-from gtts import gTTS
-import os
-import tempfile
+from io import BytesIO
 from services.chatbot import chatbot
 from models import db, ChatHistory
 
@@ -10,26 +7,27 @@ class VoiceChatService:
     """Voice-to-voice chat service"""
     
     def __init__(self):
-        self.recognizer = sr.Recognizer()
+        self._recognizer = None
+    
+    @property
+    def recognizer(self):
+        """speech_recognition Recognizer, created on first use"""
+        if self._recognizer is None:
+            import speech_recognition as sr
+            self._recognizer = sr.Recognizer()
+        return self._recognizer
     
     def speech_to_text(self, audio_data):
         """Convert speech to text"""
+        import speech_recognition as sr
         try:
-            # Create a temporary WAV file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_audio:
-                temp_audio.write(audio_data)
-                temp_audio_path = temp_audio.name
-            
-            # Load audio file
-            with sr.AudioFile(temp_audio_path) as source:
+            # Read the WAV straight from memory (AudioFile accepts file objects)
+            with sr.AudioFile(BytesIO(audio_data)) as source:
                 audio = self.recognizer.record(source)
             
             # Recognize speech
             text = self.recognizer.recognize_google(audio)
             
-            # Clean up temp file
-            os.unlink(temp_audio_path)
-            
             return True, text
         
         except sr.UnknownValueError:
@@ -42,23 +40,16 @@ class VoiceChatService:
     def text_to_speech(self, text, language='en'):
         """Convert text to speech"""
         try:
+            from gtts import gTTS
+            
             # Create gTTS object
             tts = gTTS(text=text, lang=language, slow=False)
             
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_audio:
-                temp_audio_path = temp_audio.name
-            
-            tts.save(temp_audio_path)
-            
-            # Read audio file
-            with open(temp_audio_path, 'rb') as audio_file:
-                audio_data = audio_file.read()
-            
-            # Clean up temp file
-            os.unlink(temp_audio_path)
+            # Collect the MP3 in memory
+            audio_buffer = BytesIO()
+            tts.write_to_fp(audio_buffer)
             
-            return True, audio_data
+            return True, audio_buffer.getvalue()
         
         except Exception as e:
             return False, f"Error: {str(e)}"
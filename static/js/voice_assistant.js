@@ -31,6 +31,7 @@ class VoiceAssistant {
         // Configuration
         this.FACE_LOST_TIMEOUT = 1000; // 1 second before returning to slideshow
         this.RECOGNITION_INTERVAL = 800; // Check every 0.8 seconds
+        this.cameraId = 'kiosk-' + Math.random().toString(36).slice(2, 10); // Lets the server track faces between frames
 
         // Speech Recognition
         this.recognition = null;
@@ -350,6 +351,7 @@ class VoiceAssistant {
             const frameBlob = await this.captureFrame();
             const formData = new FormData();
             formData.append('image', frameBlob, 'frame.jpg');
+            formData.append('camera_id', this.cameraId);
 
             const response = await fetch('/api/face/recognize-visitor', {
                 method: 'POST',
@@ -357,6 +359,11 @@ class VoiceAssistant {
             });
 
             const data = await response.json();
+
+            // Emotion is analyzed in the background: wait briefly for it before greeting
+            if (data.emotion && data.emotion.pending && data.emotion.job_id) {
+                data.emotion = await this.fetchEmotion(data.emotion.job_id);
+            }
             return data;
         } catch (error) {
             console.error('Face recognition error:', error);
@@ -364,6 +371,23 @@ class VoiceAssistant {
         }
     }
 
+    async fetchEmotion(jobId) {
+        try {
+            const response = await fetch(`/api/emotion/jobs/${jobId}?wait=1`);
+            const job = await response.json();
+            if (job.status === 'done' && job.result && job.result.success) {
+                return {
+                    emotion: job.result.dominant_emotion,
+                    confidence: job.result.confidence,
+                    greeting_message: job.result.greeting_message
+                };
+            }
+        } catch (error) {
+            console.error('Emotion job error:', error);
+        }
+        return null;
+    }
+
     showGreeting(userName, userRole, isRegistered) {
         const greetingOverlay = document.getElementById('greetingOverlay');
         const greetingText = document.getElementById('greetingText');
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Startup budget check: importing the app and building it must stay fast
+
+Runs `create_app()` in a fresh interpreter and fails (exit code 1) when it
+takes longer than IMPORT_TIME_BUDGET seconds (default 3) or when any heavy ML
+dependency is imported eagerly instead of on first use.
+
+Usage:
+    python test_import_time.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+BUDGET_SECONDS = float(os.environ.get('IMPORT_TIME_BUDGET', 3.0))
+
+# Must only be imported when a request actually needs them
+HEAVY_MODULES = [
+    'deepface',
+    'tensorflow',
+    'mediapipe',
+    'face_recognition',
+    'dlib',
+    'google.generativeai',
+    'gtts',
+    'speech_recognition',
+]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+create_app('development')
+elapsed = time.perf_counter() - start
+print(json.dumps({'elapsed': elapsed, 'modules': [name for name in %r if name in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def slowest_imports(limit=10):
+    """Top cumulative import times (microseconds) from python -X importtime"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'from app import create_app'],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def main():
+    print("=" * 60)
+    print("Startup Import Budget")
+    print("=" * 60)
+
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        print("✗ App failed to start:")
+        print(result.stderr)
+        return 1
+
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    failed = False
+
+    print(f"create_app() import + build: {report['elapsed']:.2f}s (budget {BUDGET_SECONDS:.2f}s)")
+    if report['elapsed'] > BUDGET_SECONDS:
+        print("✗ Startup is over budget")
+        failed = True
+    else:
+        print("✓ Startup within budget")
+
+    if report['modules']:
+        print(f"✗ Heavy modules imported at startup: {', '.join(report['modules'])}")
+        failed = True
+    else:
+        print("✓ No heavy ML modules imported at startup")
+
+    if failed:
+        print("-" * 60)
+        print("Slowest imports (cumulative):")
+        for cumulative_us, name in slowest_imports():
+            print(f"  {cumulative_us / 1e6:7.3f}s  {name}")
+
+    print("=" * 60)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Compact binary storage format for face encodings
+
+Layout (little-endian): 4-byte header = version (uint8), dtype code (uint8),
+dimension (uint16), followed by the payload:
+    float32: dim x float32                        (516 bytes for 128-d)
+    float16: dim x float16                        (260 bytes for 128-d)
+    int8:    float32 scale, dim x int8 (x * scale) (136 bytes for 128-d)
+
+The 4-byte header keeps float payloads aligned, so a whole gallery of same-format
+blobs decodes with a single np.frombuffer over the concatenated bytes.
+"""
+
+import struct
+import numpy as np
+
+
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<BBH')
+
+FLOAT32 = 'float32'
+FLOAT16 = 'float16'
+INT8 = 'int8'
+
+_CODES = {FLOAT32: 1, FLOAT16: 2, INT8: 3}
+_NAMES = {code: name for name, code in _CODES.items()}
+FORMATS = tuple(_CODES)
+
+# Pickle protocol 2+ streams start with the PROTO opcode
+_PICKLE_PREFIX = b'\x80'
+# Raw float64 ndarray.tobytes() of a 128-d encoding (pre-pickle storage)
+_RAW_FLOAT64_SIZE = 128 * 8
+
+
+def _record_dtype(fmt, dim):
+    """Structured dtype describing one encoded blob"""
+    if fmt == FLOAT32:
+        return np.dtype([('header', 'V4'), ('values', '<f4', (dim,))])
+    if fmt == FLOAT16:
+        return np.dtype([('header', 'V4'), ('values', '<f2', (dim,))])
+    if fmt == INT8:
+        return np.dtype([('header', 'V4'), ('scale', '<f4'), ('values', 'i1', (dim,))])
+    raise ValueError(f"Unknown face encoding format '{fmt}'")
+
+
+def encode_encoding(encoding, fmt=FLOAT32):
+    """
+    Serialize a face encoding
+
+    Args:
+        encoding: 1-d array-like (normally 128 floats from face_recognition)
+        fmt: 'float32' (lossless for matching), 'float16' or 'int8' (quantized)
+
+    Returns:
+        bytes: header + payload
+    """
+    vector = np.asarray(encoding, dtype=np.float32).reshape(-1)
+    dim = vector.shape[0]
+    header = HEADER.pack(FORMAT_VERSION, _CODES[fmt], dim)
+
+    if fmt == FLOAT32:
+        return header + vector.astype('<f4').tobytes()
+    if fmt == FLOAT16:
+        return header + vector.astype('<f2').tobytes()
+
+    # Symmetric per-vector int8 quantization
+    peak = float(np.max(np.abs(vector))) if dim else 0.0
+    scale = peak / 127.0 if peak > 0 else 1.0
+    quantized = np.clip(np.round(vector / scale), -127, 127).astype('i1')
+    return header + struct.pack('<f', scale) + quantized.tobytes()
+
+
+def is_encoded(blob):
+    """True if blob is already in the compact format"""
+    if not blob or len(blob) < HEADER.size:
+        return False
+    version, code, dim = HEADER.unpack_from(blob)
+    if version != FORMAT_VERSION or code not in _NAMES:
+        return False
+    return len(blob) == _record_dtype(_NAMES[code], dim).itemsize
+
+
+def encoded_format(blob):
+    """Format name of a compact blob, or None for legacy/unknown data"""
+    if not is_encoded(blob):
+        return None
+    return _NAMES[HEADER.unpack_from(blob)[1]]
+
+
+def decode_encoding(blob, allow_legacy=False):
+    """
+    Deserialize a single face encoding to a float32 array
+
+    Args:
+        blob: bytes from FaceData.face_encoding / VisitorEntry.face_encoding
+        allow_legacy: also accept pickled ndarrays and raw float64 bytes written
+            before the migration. Unpickling runs arbitrary code from the
+            database, so only scripts/migrate_face_encodings.py passes True.
+    """
+    if is_encoded(blob):
+        _, code, dim = HEADER.unpack_from(blob)
+        record = np.frombuffer(blob, dtype=_record_dtype(_NAMES[code], dim))[0]
+        values = record['values'].astype(np.float32)
+        if code == _CODES[INT8]:
+            values *= record['scale']
+        return values
+
+    if allow_legacy:
+        if blob[:1] == _PICKLE_PREFIX:
+            import pickle
+            return np.asarray(pickle.loads(blob), dtype=np.float32).reshape(-1)
+        if len(blob) == _RAW_FLOAT64_SIZE:
+            return np.frombuffer(blob, dtype=np.float64).astype(np.float32)
+
+    raise ValueError("Unrecognized face encoding format (run scripts/migrate_face_encodings.py)")
+
+
+def decode_encodings(blobs, allow_legacy=False):
+    """
+    Deserialize many face encodings into an N x dim float32 matrix
+
+    When every blob shares one header (the normal case after migration) the whole
+    batch is decoded with a single np.frombuffer over the joined bytes; mixed or
+    legacy batches fall back to decoding row by row.
+    """
+    blobs = list(blobs)
+    if not blobs:
+        return np.zeros((0, 128), dtype=np.float32)
+
+    first = blobs[0]
+    if is_encoded(first) and all(blob[:HEADER.size] == first[:HEADER.size] and len(blob) == len(first) for blob in blobs):
+        _, code, dim = HEADER.unpack_from(first)
+        records = np.frombuffer(b''.join(blobs), dtype=_record_dtype(_NAMES[code], dim))
+        values = records['values'].astype(np.float32)
+        if code == _CODES[INT8]:
+            values *= records['scale'][:, None]
+        return values
+
+    return np.stack([decode_encoding(blob, allow_legacy=allow_legacy) for blob in blobs])
+
+
+def decode_gallery(rows):
+    """
+    Decode (key, blob) rows into parallel key list and N x dim float32 matrix
+
+    Legacy (pickled / raw float64) rows are skipped with a warning rather than
+    unpickled; run scripts/migrate_face_encodings.py to convert them. Rows that
+    cannot be decoded are skipped too.
+    """
+    rows = [(key, blob) for key, blob in rows if blob]
+    keys = [key for key, _ in rows]
+    blobs = [blob for _, blob in rows]
+
+    try:
+        return keys, decode_encodings(blobs)
+    except ValueError:
+        pass
+
+    decoded_keys = []
+    vectors = []
+    legacy_count = 0
+    for key, blob in rows:
+        if not is_encoded(blob) and (blob[:1] == _PICKLE_PREFIX or len(blob) == _RAW_FLOAT64_SIZE):
+            legacy_count += 1
+            continue
+        try:
+            vectors.append(decode_encoding(blob))
+            decoded_keys.append(key)
+        except Exception as e:
+            print(f"Error decoding face encoding for {key}: {e}")
+
+    if legacy_count:
+        print(f"Warning: skipped {legacy_count} face encodings in a legacy (pickle / raw float64) format. "
+              f"Run scripts/migrate_face_encodings.py to convert them.")
+
+    matrix = np.stack(vectors) if vectors else np.zeros((0, 128), dtype=np.float32)
+    return decoded_keys, matrix
@@ -93,18 +93,22 @@ def validate_image_file(file):
         return False, f"Invalid image file: {str(e)}"
 
 
-def encoding_to_bytes(encoding):
+def encoding_to_bytes(encoding, fmt=None):
     """
     Convert numpy face encoding array to bytes for database storage
     
     Args:
         encoding: numpy array from face_recognition
+        fmt: storage format ('float32', 'float16', 'int8'); defaults to FACE_ENCODING_FORMAT
         
     Returns:
-        bytes: Serialized encoding
+        bytes: Serialized encoding (see utils/face_encoding.py)
     """
-    import pickle
-    return pickle.dumps(encoding)
+    from utils.face_encoding import encode_encoding
+    if fmt is None:
+        from flask import current_app, has_app_context
+        fmt = current_app.config.get('FACE_ENCODING_FORMAT', 'float32') if has_app_context() else 'float32'
+    return encode_encoding(encoding, fmt)
 
 
 def bytes_to_encoding(encoding_bytes):
@@ -116,6 +120,10 @@ def bytes_to_encoding(encoding_bytes):
         
     Returns:
         numpy array: Face encoding
+        
+    Raises:
+        ValueError: for legacy (pickle / raw float64) bytes; run
+            scripts/migrate_face_encodings.py to convert them
     """
-    import pickle
-    return pickle.loads(encoding_bytes)
+    from utils.face_encoding import decode_encoding
+    return decode_encoding(encoding_bytes)
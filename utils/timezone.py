@@ -0,0 +1,57 @@
+"""
+IST calendar helpers for UTC-stored timestamps
+Timestamps are stored as naive UTC; campus days are IST calendar days. Day
+filters are turned into half-open UTC ranges so they stay index range scans.
+"""
+
+import pytz
+from datetime import datetime, time, timedelta
+
+
+IST = pytz.timezone('Asia/Kolkata')
+
+
+def to_ist(utc_timestamp):
+    """Aware IST datetime for a naive UTC timestamp"""
+    return utc_timestamp.replace(tzinfo=pytz.UTC).astimezone(IST)
+
+
+def ist_date(utc_timestamp):
+    """IST calendar date of a naive UTC timestamp"""
+    return to_ist(utc_timestamp).date()
+
+
+def ist_today():
+    """Current IST calendar date"""
+    return ist_date(datetime.utcnow())
+
+
+def ist_midnight_utc(day):
+    """Naive UTC instant at which an IST calendar day starts"""
+    return IST.localize(datetime.combine(day, time.min)).astimezone(pytz.UTC).replace(tzinfo=None)
+
+
+def ist_day_range(start_date, end_date=None):
+    """
+    Half-open naive UTC range [start, end) covering IST days start_date..end_date
+
+    Args:
+        start_date: first IST day (inclusive)
+        end_date: last IST day (inclusive), defaults to start_date
+    """
+    end_date = end_date or start_date
+    return ist_midnight_utc(start_date), ist_midnight_utc(end_date + timedelta(days=1))
+
+
+def filter_ist_days(query, column, start_date=None, end_date=None):
+    """
+    Restrict a query to IST days on a naive UTC timestamp column
+
+    Either bound may be omitted. Compares the bare column against UTC
+    instants (no date() wrapper), so an index on the column is used.
+    """
+    if start_date:
+        query = query.filter(column >= ist_midnight_utc(start_date))
+    if end_date:
+        query = query.filter(column < ist_midnight_utc(end_date + timedelta(days=1)))
+    return query
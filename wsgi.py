@@ -0,0 +1,22 @@
+"""
+WSGI entry point for production servers
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The module is imported once in the gunicorn master (preload_app), so the
+face galleries, chatbot and presence table are loaded before workers fork and
+shared copy-on-write. Per-worker handles are rebuilt by the post_fork hook in
+gunicorn.conf.py.
+"""
+
+import os
+from app import create_app, warm_up
+from models import db
+
+app = create_app(os.environ.get('FLASK_CONFIG') or 'production')
+
+# Create tables if they don't exist (e.g. the daily rollups on a fresh deploy)
+with app.app_context():
+    db.create_all()
+
+warm_up(app)